@@ -22,7 +22,7 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 import ollama
-from ollama_config import get_client, get_model
+from ollama_config import get_model, stream_ollama
 
 # ---------------------------------------------------------------------------
 # Chat engine (non-UI logic)
@@ -33,7 +33,6 @@ class ChatEngine:
     """Handles all Ollama API interactions outside of the UI thread."""
 
     def __init__(self):
-        self.client = get_client()
         self.messages: list[dict] = []
         self.system_prompt = ""
 
@@ -72,13 +71,17 @@ class ChatEngine:
         return results
 
     def chat_stream(self, model: str, temperature: float, callback):
-        """Stream a chat response, calling `callback(token)` for each piece."""
+        """
+        Stream a chat response, calling `callback(token)` for each piece.
+        The request is retried until the first token arrives and gives up when
+        the server stalls for longer than the call's deadline (OLLAMA_DEADLINE).
+        """
         full = ""
         try:
-            for chunk in self.client.chat(
+            for chunk in stream_ollama(
+                "chat",
                 model,
                 messages=self.messages,
-                stream=True,
                 options={"temperature": temperature},
             ):
                 token = chunk.get("message", {}).get("content", "")
@@ -0,0 +1,112 @@
+"""
+Semantic answer cache for the agentic RAG loop.
+
+A full agentic answer costs 3-8 sequential LLM calls. Many questions are
+paraphrases of earlier ones, so the cache stores each answered question's
+embedding and returns the stored answer when a new question is similar
+enough (cosine similarity >= threshold). Entries expire after a TTL and are
+tied to an index version, so any change to the index invalidates them.
+
+Entries are persisted in SQLite and mirrored in memory as unit vectors, so a
+lookup is one scan of at most `max_entries` dot products, done outside the
+lock, and does not touch the disk.
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from array import array
+
+from quantize import dot
+
+
+def _unit(vector):
+    norm = math.sqrt(dot(vector, vector)) or 1.0
+    return array("f", (x / norm for x in vector))
+
+
+class SemanticAnswerCache:
+    """Question-embedding -> answer cache with similarity threshold, TTL and index versioning."""
+
+    def __init__(self, path: str, threshold: float = 0.92, ttl: float = 86400.0,
+                 max_entries: int = 1000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " id INTEGER PRIMARY KEY, question TEXT NOT NULL, vector BLOB NOT NULL,"
+            " answer TEXT NOT NULL, created REAL NOT NULL, index_version TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        # In-memory mirror: (row id, question, unit vector, answer, created, index version)
+        self._entries = [
+            (row_id, question, _unit(array("f", blob)), answer, created, version)
+            for row_id, question, blob, answer, created, version in self._conn.execute(
+                "SELECT id, question, vector, answer, created, index_version FROM answers ORDER BY id"
+            )
+        ]
+
+    def lookup(self, vector, index_version: str):
+        """
+        Return (answer, cached question, similarity) for the most similar live
+        entry at or above the threshold, or None.
+        """
+        now = time.time()
+        query = _unit(vector)
+        best = None
+        with self._lock:
+            entries = list(self._entries)
+        for _, question, cached, answer, created, version in entries:
+            if version != index_version or now - created > self.ttl:
+                continue
+            similarity = dot(query, cached)
+            if similarity >= self.threshold and (best is None or similarity > best[2]):
+                best = (answer, question, similarity)
+        with self._lock:
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return best
+
+    def store(self, question: str, vector, answer: str, index_version: str):
+        """Remember an answer; expired entries and the oldest ones beyond max_entries are dropped."""
+        if self.max_entries <= 0 or not answer:
+            return
+        vector = array("f", vector)
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO answers (question, vector, answer, created, index_version)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (question, vector.tobytes(), answer, now, index_version),
+            )
+            self._entries.append((cursor.lastrowid, question, _unit(vector), answer, now, index_version))
+            keep = [e for e in self._entries if now - e[4] <= self.ttl][-self.max_entries:]
+            self._drop({e[0] for e in self._entries} - {e[0] for e in keep})
+            self._entries = keep
+            self._conn.commit()
+
+    def invalidate(self, index_version: str):
+        """Drop every entry that was answered against a different index version."""
+        with self._lock:
+            stale = {e[0] for e in self._entries if e[5] != index_version}
+            self._drop(stale)
+            self._entries = [e for e in self._entries if e[0] not in stale]
+            self._conn.commit()
+
+    def _drop(self, row_ids):
+        if row_ids:
+            self._conn.executemany("DELETE FROM answers WHERE id = ?", [(i,) for i in row_ids])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> str:
+        return f"{len(self._entries)} entries, {self.hits} hits, {self.misses} misses"
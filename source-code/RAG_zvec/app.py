@@ -1,7 +1,12 @@
 import os
+import hashlib
 import json
-import urllib.request
+import shutil
+import time
 import re
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import sys
 import zvec
@@ -10,7 +15,20 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from ollama_config import get_model
+from answer_cache import SemanticAnswerCache
+from bm25 import BM25Index, reciprocal_rank_fusion
+from chunker import estimate_tokens
+from context_packer import pack_context
+from disk_cache import DiskLRUCache
+from http_pool import HTTPConnectionPool
+from ingest import IngestPipeline
+from journal import ChangeLog, read_log
+from minhash import MinHashLSH, minhash_signature
+from quantize import STORAGE_MODES, decode_vector, dot, encode_query, encode_vector
+from sharding import ShardedBM25, ShardedCollection, shard_name
+from tracing import Trace, TraceLog, annotate, format_summary, record_llm_call
+
+from ollama_config import get_model, get_policy, get_residency, host_url, resident
 
 # Configuration
 config = {
@@ -18,6 +36,41 @@ config = {
     "extensions": (".txt",),
     "embedding_model": os.getenv("EMBEDDING_MODEL", "embeddinggemma"),
     "chat_model": os.getenv("CHAT_MODEL", get_model()),
+    "embed_batch_size": int(os.getenv("EMBED_BATCH_SIZE", "32")),
+    "embed_workers": int(os.getenv("EMBED_WORKERS", "2")),
+    "parse_workers": int(os.getenv("PARSE_WORKERS", "0")) or None,  # None: min(4, CPUs)
+    "insert_batch_size": int(os.getenv("INSERT_BATCH_SIZE", "256")),
+    "parse_batch_size": int(os.getenv("PARSE_BATCH_SIZE", "256")),
+    "checkpoint_chunks": int(os.getenv("CHECKPOINT_CHUNKS", "2048")),
+    "db_path": os.getenv("ZVEC_PATH", "./zvec_example"),
+    "rebuild_index": os.getenv("REBUILD_INDEX", ""),  # any value, or a comma-separated list of shards
+    "shards": int(os.getenv("SHARDS", "1")),
+    "shard_by": os.getenv("SHARD_BY", "hash"),  # hash (into SHARDS shards) or directory
+    "shard_workers": int(os.getenv("SHARD_WORKERS", "2")),  # shards built in parallel
+    "embedding_cache_path": os.getenv("EMBEDDING_CACHE", "./embedding_cache.sqlite"),
+    "embedding_cache_size": int(os.getenv("EMBEDDING_CACHE_SIZE", "50000")),
+    "search_workers": int(os.getenv("SEARCH_WORKERS", "4")),
+    "stream": os.getenv("STREAM", "1") != "0",
+    "pool_size": int(os.getenv("OLLAMA_POOL_SIZE", "8")),
+    "timeout": float(os.getenv("OLLAMA_TIMEOUT", "0")) or None,  # socket timeout of calls without a deadline
+    "chunk_tokens": int(os.getenv("CHUNK_TOKENS", "128")),
+    "chunk_overlap_tokens": int(os.getenv("CHUNK_OVERLAP_TOKENS", "12")),
+    "retrieval_mode": os.getenv("RETRIEVAL_MODE", "hybrid"),  # vector, bm25 or hybrid
+    "vector_storage": os.getenv("VECTOR_STORAGE", "fp32"),  # fp32, fp16 or int8
+    "rescore_fp32": os.getenv("RESCORE_FP32", "1") != "0",  # exact re-score of quantized candidates
+    "rescore_factor": int(os.getenv("RESCORE_FACTOR", "4")),  # candidates fetched per requested hit
+    "near_duplicate_threshold": float(os.getenv("NEAR_DUP_THRESHOLD", "0.9")),  # 0 disables the filter
+    "num_ctx": int(os.getenv("NUM_CTX", "4096")),  # context window requested from Ollama
+    "answer_tokens": int(os.getenv("ANSWER_TOKENS", "1024")),  # part of num_ctx kept free for the reply
+    "speculative": os.getenv("SPECULATIVE", "0") != "0",  # overlap independent agent stages
+    "llm_cache_path": os.getenv("LLM_CACHE", ""),  # empty disables the LLM response cache
+    "llm_cache_size": int(os.getenv("LLM_CACHE_SIZE", "10000")),
+    "answer_cache_path": os.getenv("ANSWER_CACHE", "./answer_cache.sqlite"),
+    "answer_cache_size": int(os.getenv("ANSWER_CACHE_SIZE", "0")),  # 0 disables the answer cache
+    "answer_cache_threshold": float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92")),
+    "answer_cache_ttl": float(os.getenv("ANSWER_CACHE_TTL", "86400")),
+    "trace_path": os.getenv("TRACE_FILE", ""),  # JSONL file of per-question traces; empty disables it
+    "trace_summary": os.getenv("TRACE_SUMMARY", "0") != "0",  # print p50/p95 per stage on exit
 }
 
 if os.environ.get("CLOUD"):
@@ -27,113 +80,530 @@ if os.environ.get("CLOUD"):
         "Authorization": "Bearer " + os.environ.get("OLLAMA_API_KEY", ""),
     }
 else:
-    OLLAMA_BASE = "http://localhost:11434"
+    # A URL, or Ollama's own OLLAMA_HOST form (host[:port], e.g. 127.0.0.1 or 0.0.0.0:11434)
+    OLLAMA_BASE = host_url(os.getenv("OLLAMA_HOST", "http://localhost:11434"))
     OLLAMA_HEADERS = {"Content-Type": "application/json"}
 
 
-def _make_request(url, data):
-    """Helper to make an HTTP POST with appropriate headers."""
-    encoded = json.dumps(data).encode("utf-8")
-    req = urllib.request.Request(url, data=encoded, headers=OLLAMA_HEADERS)
-    return req
+# Shared keep-alive connections for every embedding and chat call. The pool itself only
+# replaces keep-alive connections the server closed while idle; timeouts and other failures
+# are retried by the shared call policy of ollama_config (OLLAMA_RETRIES, OLLAMA_BREAKER_*).
+ollama_pool = HTTPConnectionPool(
+    OLLAMA_BASE,
+    OLLAMA_HEADERS,
+    maxsize=config["pool_size"],
+    timeout=config["timeout"],
+)
+
+
+def post_ollama(path, payload):
+    """
+    POST to Ollama under the shared policy (deadline of OLLAMA_DEADLINE,
+    retries, circuit breaker), holding a residency slot for the model when
+    OLLAMA_RESIDENT_* is configured.
+    """
+    deadline = get_policy().deadline
+    end = time.monotonic() + deadline  # waiting for a residency slot counts against the deadline
+    with resident(payload["model"], deadline) as keep_alive:
+        if keep_alive is not None:
+            payload = dict(payload, keep_alive=keep_alive)
+        return get_policy().call(
+            lambda timeout: ollama_pool.post_json(path, payload, timeout=timeout),
+            endpoint=OLLAMA_BASE, deadline=end - time.monotonic(),
+        )
 
 
 def get_embedding(text):
-    """Get embedding from Ollama (local or cloud)."""
-    url = f"{OLLAMA_BASE}/api/embeddings"
+    """Get embedding from Ollama (local or cloud); None if Ollama could not be reached."""
+    vectors = get_embeddings([text])
+    return None if vectors is None else vectors[0]
+
+
+def _request_embeddings(texts):
+    """One call to the multi-input /api/embed endpoint; raises on failure."""
     data = {
         "model": config["embedding_model"],
-        "prompt": text,
+        "input": list(texts),
     }
-    req = _make_request(url, data)
+    return post_ollama("/api/embed", data)["embeddings"]
+
+
+embedding_cache = DiskLRUCache(config["embedding_cache_path"], config["embedding_cache_size"])
+
+
+def _embedding_key(text):
+    """Content address of an embedding: (embedding model, text hash)."""
+    return hashlib.sha256(f"{config['embedding_model']}\0{text}".encode()).hexdigest()
+
+
+def embed_texts(texts):
+    """
+    Get embeddings for a batch of texts, raising on failure. Texts already in
+    the on-disk embedding cache are served from it; the rest are embedded with
+    one /api/embed call. Vectors are compact float32 arrays (array("f")), which
+    take a quarter of the memory of Python float lists and are accepted by zvec.
+    """
+    keys = [_embedding_key(text) for text in texts]
+    found = {
+        key: array("f", blob)
+        for key, blob in embedding_cache.get_many(list(set(keys))).items()
+    }
+    missing = {key: text for key, text in zip(keys, texts) if key not in found}
+    if missing:
+        vectors = _request_embeddings(list(missing.values()))
+        fresh = {key: array("f", vector) for key, vector in zip(missing, vectors)}
+        embedding_cache.put_many({key: vector.tobytes() for key, vector in fresh.items()})
+        found.update(fresh)
+    return [found[key] for key in keys]
+
+
+def get_embeddings(texts):
+    """
+    Get embeddings for a batch of texts (see embed_texts). Failures are
+    reported and return None, so callers can fall back to keyword search
+    instead of querying with meaningless zero vectors.
+    """
     try:
-        with urllib.request.urlopen(req) as res:
-            return json.loads(res.read().decode("utf-8"))["embedding"]
+        return embed_texts(texts)
     except Exception as e:
         print(f"Error calling Ollama embeddings: {e}")
-        return [0.0] * 768
+        return None
 
 
-def chunk_text(text, chunk_size=500, overlap=50):
-    """Split text into overlapping chunks."""
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        start = end - overlap
-    return chunks
+def _doc_id(rel_path, i):
+    """Stable zvec doc id for chunk `i` of a file (zvec ids cannot contain '/' or spaces)."""
+    return f"{hashlib.sha1(rel_path.encode('utf-8')).hexdigest()[:16]}_{i}"
 
 
-def build_index():
-    """Index all text files from the data directory into zvec."""
-    # Define collection schema (embeddinggemma: 768 dimensions)
+def _manifest_path(db_path):
+    return f"{db_path}_manifest.json"
+
+
+def _bm25_path(db_path):
+    return f"{db_path}_bm25.json"
+
+
+def _minhash_path(db_path):
+    return f"{db_path}_minhash.json"
+
+
+# BM25 side index and content version of each open collection, keyed by collection path
+bm25_indexes = {}
+index_versions = {}
+# Change log of each loaded or saved manifest, keyed by collection path
+manifest_logs = {}
+
+
+def load_manifest(db_path):
+    """Load the index manifest: one entry per indexed file with mtime, size, hash and chunk ids."""
+    try:
+        with open(_manifest_path(db_path), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    log_id = manifest.pop("log", None)
+    for op, *args in read_log(_manifest_path(db_path), log_id):
+        if op == "in_progress":
+            manifest["in_progress"] = args[0]
+        elif args[1] is None:
+            manifest["files"].pop(args[0], None)
+        else:
+            manifest["files"][args[0]] = args[1]
+    manifest_logs[db_path] = ChangeLog()
+    manifest_logs[db_path].attach(_manifest_path(db_path), log_id)
+    return manifest
+
+
+def save_manifest(manifest, db_path):
+    """Atomically write the index manifest next to the zvec collection."""
+    log_id = ChangeLog.new_id()
+    tmp_path = _manifest_path(db_path) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({**manifest, "log": log_id}, f, indent=1)
+    os.replace(tmp_path, _manifest_path(db_path))
+    manifest_logs.setdefault(db_path, ChangeLog()).saved(_manifest_path(db_path), log_id)
+
+
+def save_manifest_changes(manifest, db_path, changed):
+    """Persist the entries of the `changed` files and the in-progress files, usually as a log append."""
+    changes = [["file", rel, manifest["files"].get(rel)] for rel in sorted(changed)]
+    changes.append(["in_progress", manifest.get("in_progress", {})])
+    manifest_logs.setdefault(db_path, ChangeLog()).persist(
+        _manifest_path(db_path), changes, lambda path: save_manifest(manifest, db_path))
+
+
+def index_settings():
+    """Settings that change the stored chunks or vectors; changing any of them forces a rebuild."""
+    return {
+        "embedding_model": config["embedding_model"],
+        "chunk_tokens": config["chunk_tokens"],
+        "chunk_overlap_tokens": config["chunk_overlap_tokens"],
+        "near_duplicate_threshold": config["near_duplicate_threshold"],
+        "vector_storage": config["vector_storage"],
+    }
+
+
+def compute_index_version(manifest):
+    """Hash of the index settings and the content hash of every indexed file."""
+    state = [manifest["settings"], sorted((rel, e["sha256"]) for rel, e in manifest["files"].items())]
+    return hashlib.sha256(json.dumps(state).encode("utf-8")).hexdigest()[:16]
+
+
+def open_collection(db_path, rebuild=False):
+    """
+    Open the persistent zvec collection at `db_path` with its manifest, BM25
+    side index and near-duplicate index (None when NEAR_DUP_THRESHOLD is 0),
+    creating all of them when any is missing, when `rebuild` is set, or when
+    the index settings changed.
+    """
+    threshold = config["near_duplicate_threshold"]
+    manifest = load_manifest(db_path)
+    if (
+        os.path.exists(db_path)
+        and os.path.exists(_bm25_path(db_path))
+        and (not threshold or os.path.exists(_minhash_path(db_path)))
+        and manifest is not None
+        and manifest.get("settings") == index_settings()
+        and not rebuild
+    ):
+        dedup = MinHashLSH.load(_minhash_path(db_path)) if threshold else None
+        return zvec.open(db_path), manifest, BM25Index.load(_bm25_path(db_path)), dedup
+
+    # Define collection schema (embeddinggemma: 768 dimensions). Quantized
+    # storage uses a smaller vector type; int8 adds the per-vector scale.
+    storage = config["vector_storage"]
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"VECTOR_STORAGE must be one of {', '.join(STORAGE_MODES)}, not {storage!r}")
+    vector_type = {"fp32": zvec.DataType.VECTOR_FP32, "fp16": zvec.DataType.VECTOR_FP16,
+                   "int8": zvec.DataType.VECTOR_INT8}[storage]
+    fields = [zvec.FieldSchema("text", zvec.DataType.STRING)]
+    if storage == "int8":
+        fields.append(zvec.FieldSchema("scale", zvec.DataType.FLOAT))
     schema = zvec.CollectionSchema(
         name="example",
-        vectors=zvec.VectorSchema("embedding", zvec.DataType.VECTOR_FP32, 768),
-        fields=zvec.FieldSchema("text", zvec.DataType.STRING),
+        vectors=zvec.VectorSchema("embedding", vector_type, 768),
+        fields=fields,
     )
-
-    db_path = "./zvec_example"
     if os.path.exists(db_path):
-        import shutil
         shutil.rmtree(db_path)
-
     collection = zvec.create_and_open(path=db_path, schema=schema)
+    manifest = {"settings": index_settings(), "files": {}}
+    save_manifest(manifest, db_path)
+    return collection, manifest, BM25Index(), MinHashLSH(threshold) if threshold else None
+
 
-    docs = []
-    doc_count = 0
+def scan_data_dir():
+    """Map relative path -> absolute path for every indexable file under DATA_DIR."""
+    found = {}
     for root, _, files in os.walk(config["data_dir"]):
         for file in files:
             if file.lower().endswith(config["extensions"]):
-                try:
-                    file_path = Path(root) / file
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        content = f.read()
-                    chunks = chunk_text(content)
-                    for i, chunk in enumerate(chunks):
-                        embedding = get_embedding(chunk)
-                        docs.append(zvec.Doc(
-                            id=f"{file}_{i}",
-                            vectors={"embedding": embedding},
-                            fields={"text": chunk},
-                        ))
-                    doc_count += len(chunks)
-                except Exception:
-                    pass
-
-    if docs:
-        collection.insert(docs)
-    print(f"Indexed {doc_count} chunks from {config['data_dir']}")
+                file_path = Path(root) / file
+                found[file_path.relative_to(config["data_dir"]).as_posix()] = file_path
+    return found
+
+
+def shard_layout(files):
+    """
+    Split the data files into shards: {shard name: (zvec path, {rel: path})}.
+    Without sharding there is one shard named "" stored at ZVEC_PATH.
+    """
+    if config["shard_by"] != "directory" and config["shards"] <= 1:
+        return {"": (config["db_path"], files)}
+    layout = {}
+    for rel, file_path in files.items():
+        name = shard_name(rel, config["shard_by"], config["shards"])
+        layout.setdefault(name, (f"{config['db_path']}_{name}", {}))[1][rel] = file_path
+    return layout
+
+
+def build_shard(db_path, current, rebuild=False):
+    """
+    Bring one zvec collection up to date with the files `current` ({rel: path})
+    assigned to it and return (collection, manifest, ingest report, removed files).
+
+    Unchanged files (same mtime and size, or same content hash) are skipped,
+    new and changed files are re-embedded through the ingestion pipeline, and
+    chunks of removed files are deleted. Chunks that are near-duplicates of an
+    indexed chunk are skipped; when that chunk is later deleted or rewritten,
+    the files with skipped copies of it are ingested again, so no content is
+    lost whichever file held the indexed copy.
+    """
+    collection, manifest, bm25, dedup = open_collection(db_path, rebuild)
+    indexed = manifest["files"]
+    changed = set()  # files whose manifest entry changed since the last checkpoint
+
+    def delete_chunks(chunk_ids):
+        collection.delete(chunk_ids)
+        for doc_id in chunk_ids:
+            bm25.remove(doc_id)
+            if dedup is not None:
+                dedup.remove(doc_id)
+
+    # Files a previous run was interrupted in: drop their partial chunks and re-ingest them
+    for rel, chunk_ids in manifest.pop("in_progress", {}).items():
+        changed.add(rel)
+        previous = indexed.pop(rel, None)
+        delete_chunks(sorted(set(chunk_ids) | set(previous["chunk_ids"] if previous else [])))
+
+    removed = [rel for rel in indexed if rel not in current]
+    for rel in removed:
+        changed.add(rel)
+        delete_chunks(indexed.pop(rel)["chunk_ids"])
+
+    storage = config["vector_storage"]
+
+    def write_chunks(items):
+        docs = []
+        for doc_id, text, vector in items:
+            stored, scale = encode_vector(vector, storage)
+            fields = {"text": text, "scale": scale} if storage == "int8" else {"text": text}
+            docs.append(zvec.Doc(id=doc_id, vectors={"embedding": stored}, fields=fields))
+        collection.upsert(docs)
+        for doc_id, text, _ in items:
+            bm25.add(doc_id, text)
+
+    def file_done(rel, entry):
+        previous = indexed.get(rel)
+        if previous:
+            stale_ids = sorted(set(previous["chunk_ids"]) - set(entry["chunk_ids"]))
+            if stale_ids:
+                delete_chunks(stale_ids)
+        indexed[rel] = entry
+        changed.add(rel)
+
+    def file_failed(rel, written_ids):
+        # Drop the partial new version and the previous one, whose chunks may already be
+        # overwritten; without a manifest entry the file is indexed afresh on the next start
+        previous = indexed.pop(rel, None)
+        changed.add(rel)
+        delete_chunks(sorted(set(written_ids) | set(previous["chunk_ids"] if previous else [])))
+
+    def checkpoint(in_progress):
+        # Only the changes since the last checkpoint are written (see journal.py)
+        collection.flush()
+        bm25.save_changes(_bm25_path(db_path))
+        if dedup is not None:
+            dedup.save_changes(_minhash_path(db_path))
+        manifest["in_progress"] = in_progress
+        save_manifest_changes(manifest, db_path, changed)
+        changed.clear()
+
+    pipeline = IngestPipeline(
+        embed_texts,
+        write_chunks,
+        file_done,
+        file_failed,
+        _doc_id,
+        checkpoint,
+        chunk_tokens=config["chunk_tokens"],
+        overlap_tokens=config["chunk_overlap_tokens"],
+        batch_size=config["embed_batch_size"],
+        embed_workers=config["embed_workers"],
+        parse_workers=config["parse_workers"],
+        insert_batch_size=config["insert_batch_size"],
+        checkpoint_every=config["checkpoint_chunks"],
+        dedup=dedup,
+        parse_batch_size=config["parse_batch_size"],
+    )
+    tasks = [(rel, file_path, indexed.get(rel)) for rel, file_path in sorted(current.items())]
+    report = pipeline.run(tasks)
+    # Ingest files again whose skipped near-duplicates lost their indexed copy (its file was
+    # removed or changed). One pass normally settles them; the next build checks again.
+    for _ in range(3):
+        orphaned = [] if dedup is None else [
+            rel for rel, entry in sorted(indexed.items())
+            if rel in current and any(dedup.fingerprint(doc_id) != fingerprint
+                                      for doc_id, fingerprint in entry.get("duplicate_of", {}).items())
+        ]
+        if not orphaned:
+            break
+        # Without its content hash the previous entry no longer matches, so the file is re-chunked
+        pipeline.run([(rel, current[rel], dict(indexed[rel], mtime=None, sha256=None)) for rel in orphaned],
+                     report)
+    bm25_indexes[collection.path] = bm25
+    return collection, manifest, report, removed
+
+
+def build_index():
+    """
+    Bring the persistent index up to date with the data directory and return
+    the collection to search: a zvec collection, or a ShardedCollection over
+    one collection per shard when SHARDS > 1 or SHARD_BY=directory. Shards are
+    built in parallel (SHARD_WORKERS at a time). REBUILD_INDEX rebuilds every
+    shard, or only the shards it names.
+    """
+    layout = shard_layout(scan_data_dir())
+    requested = {name.strip() for name in config["rebuild_index"].split(",") if name.strip()}
+    rebuild_all = bool(requested) and not requested & set(layout)
+    with ThreadPoolExecutor(max_workers=max(1, config["shard_workers"])) as pool:
+        futures = {
+            name: pool.submit(build_shard, db_path, files, rebuild_all or name in requested)
+            for name, (db_path, files) in sorted(layout.items())
+        }
+        built = {name: future.result() for name, future in futures.items()}
+
+    for name, (_, _, report, removed) in built.items():
+        prefix = f"[{name}] " if name else ""
+        print(prefix + report.summary())
+        print(f"{prefix}Removed {len(removed)} deleted file(s) from the index of {config['data_dir']}")
+    print(f"Embedding cache: {embedding_cache.stats()}")
+
+    if len(built) == 1 and "" in built:
+        collection, manifest, _, _ = built[""]
+        version = compute_index_version(manifest)
+    else:
+        collection = ShardedCollection({name: shard[0] for name, shard in built.items()}, config["db_path"])
+        bm25_indexes[collection.path] = ShardedBM25([bm25_indexes[c.path] for c in collection.shards.values()])
+        versions = sorted((name, compute_index_version(shard[1])) for name, shard in built.items())
+        version = hashlib.sha256(json.dumps(versions).encode("utf-8")).hexdigest()[:16]
+    index_versions[collection.path] = version
+    if answer_cache is not None:
+        answer_cache.invalidate(answer_cache_version(collection))
     return collection
 
 
 def search(collection, query, topk=5):
-    """Search the zvec collection for chunks relevant to the query."""
-    query_vector = get_embedding(query)
+    """Search the zvec collection for chunks relevant to the query (keyword only if embedding fails)."""
+    query_vector = None if config["retrieval_mode"] == "bm25" else get_embedding(query)
+    mode = "bm25" if query_vector is None else None
+    return retrieve(collection, query, query_vector, topk=topk, mode=mode)
+
+
+def vector_hits(collection, query_vector, topk=5):
+    """
+    (doc id, text) pairs from the zvec vector query, best first.
+
+    With quantized storage (VECTOR_STORAGE fp16 or int8), RESCORE_FACTOR * topk
+    candidates are fetched and re-ranked: exactly against their float32
+    embeddings from the embedding cache (or the decoded stored vectors) when
+    RESCORE_FP32 is on, otherwise by the quantized score times the int8 scale.
+    """
+    storage = config["vector_storage"]
+    if storage == "fp32":
+        results = collection.query(zvec.VectorQuery("embedding", vector=query_vector), topk=topk)
+        return [(res.id, res.fields["text"]) for res in results if res.fields and res.fields.get("text")]
+
+    rescore = config["rescore_fp32"]
     results = collection.query(
-        zvec.VectorQuery("embedding", vector=query_vector),
-        topk=topk,
+        zvec.VectorQuery("embedding", vector=encode_query(query_vector, storage)),
+        topk=topk * max(1, config["rescore_factor"]),
+        include_vector=rescore,
     )
-    chunks = []
+    results = [res for res in results if res.fields and res.fields.get("text")]
+    exact = {}
+    if rescore:
+        exact = embedding_cache.get_many(list({_embedding_key(res.fields["text"]) for res in results}))
+    scored = []
     for res in results:
-        text = res.fields.get("text", "") if res.fields else ""
+        scale = res.fields.get("scale", 1.0)
+        if not rescore:
+            score = res.score * scale
+        else:
+            blob = exact.get(_embedding_key(res.fields["text"]))
+            vector = array("f", blob) if blob else decode_vector(res.vectors["embedding"], scale, storage)
+            score = dot(query_vector, vector)
+        scored.append((score, res.id, res.fields["text"]))
+    scored.sort(key=lambda hit: hit[0], reverse=True)
+    return [(doc_id, text) for _, doc_id, text in scored[:topk]]
+
+
+def bm25_hits(collection, query, topk=5):
+    """(doc id, text) pairs from the BM25 side index, best first."""
+    bm25 = bm25_indexes.get(collection.path)
+    if bm25 is None:
+        return []
+    ids = [doc_id for doc_id, _ in bm25.search(query, topk)]
+    if not ids:
+        return []
+    docs = collection.fetch(ids)
+    hits = []
+    for doc_id in ids:
+        doc = docs.get(doc_id)
+        text = doc.fields.get("text", "") if doc is not None and doc.fields else ""
         if text:
-            chunks.append(text)
-    return chunks
+            hits.append((doc_id, text))
+    return hits
+
+
+def retrieve(collection, query, query_vector, topk=5, mode=None):
+    """
+    Return the texts of the `topk` best chunks for a query.
+
+    mode (default RETRIEVAL_MODE) is "vector" for zvec only, "bm25" for the
+    keyword index only, or "hybrid" to merge 2 * topk candidates from each
+    with reciprocal rank fusion.
+    """
+    mode = mode or config["retrieval_mode"]
+    if mode == "vector":
+        return [text for _, text in vector_hits(collection, query_vector, topk)]
+    if mode == "bm25":
+        return [text for _, text in bm25_hits(collection, query, topk)]
+    dense = vector_hits(collection, query_vector, 2 * topk)
+    sparse = bm25_hits(collection, query, 2 * topk)
+    texts = dict(dense + sparse)
+    fused = reciprocal_rank_fusion([[doc_id for doc_id, _ in dense],
+                                    [doc_id for doc_id, _ in sparse]])
+    return [texts[doc_id] for doc_id in fused[:topk]]
+
+
+# Shared pool for issuing the vector queries of one retrieval round concurrently
+search_pool = ThreadPoolExecutor(max_workers=config["search_workers"])
+
+# Retrieved chunks checked and skipped by the near-duplicate filter of search_multi_queries
+retrieval_duplicates = {"checked": 0, "skipped": 0}
+retrieval_duplicates_lock = threading.Lock()
 
 
-def search_multi_queries(collection, queries, topk=3):
-    """Search the zvec collection for multiple queries, aggregating and deduplicating chunks."""
+def search_multi_queries(collection, queries, topk=3, scores=None):
+    """
+    Search the zvec collection for multiple queries, aggregating and deduplicating chunks.
+    Besides exact repeats, chunks that are near-duplicates (MinHash similarity of at
+    least NEAR_DUP_THRESHOLD) of an earlier result are dropped. All queries are
+    embedded with a single batched call and the queries run concurrently, so a
+    round costs about as much as a single query.
+
+    If a `scores` dict is given, each chunk's relevance is accumulated into it
+    as sum of 1 / (60 + rank) over the queries that returned it, which ranks
+    chunks consistently across queries, rounds and retrieval modes.
+    """
+    if not queries:
+        return []
+    start = time.perf_counter()
+    query_vectors = None if config["retrieval_mode"] == "bm25" else get_embeddings(queries)
+    # Without query embeddings (bm25 mode, or Ollama unreachable) only the keyword index is searched
+    mode = "bm25" if query_vectors is None else None
+    embedded = time.perf_counter()
+    results = list(search_pool.map(
+        lambda query, vector: retrieve(collection, query, vector, topk=topk, mode=mode),
+        queries, query_vectors or [None] * len(queries),
+    ))
+    annotate(queries=len(queries), embed_seconds=round(embedded - start, 4),
+             search_seconds=round(time.perf_counter() - embedded, 4))
+    threshold = config["near_duplicate_threshold"]
+    dedup = MinHashLSH(threshold) if threshold else None
     all_chunks = []
     seen = set()
-    for query in queries:
-        chunks = search(collection, query, topk=topk)
-        for chunk in chunks:
+    checked = skipped = 0
+    for chunks in results:
+        for rank, chunk in enumerate(chunks, start=1):
+            if scores is not None:
+                scores[chunk] = scores.get(chunk, 0.0) + 1.0 / (60 + rank)
             cleaned = chunk.strip()
-            if cleaned and cleaned not in seen:
-                seen.add(cleaned)
-                all_chunks.append(chunk)
+            if not cleaned or cleaned in seen:
+                continue
+            seen.add(cleaned)
+            if dedup is not None:
+                checked += 1
+                signature = minhash_signature(cleaned)
+                if dedup.find(signature) is not None:
+                    skipped += 1
+                    continue
+                dedup.add(len(all_chunks), signature)
+            all_chunks.append(chunk)
+    with retrieval_duplicates_lock:
+        retrieval_duplicates["checked"] += checked
+        retrieval_duplicates["skipped"] += skipped
     return all_chunks
 
 
@@ -141,9 +611,23 @@ def search_multi_queries(collection, queries, topk=3):
 # Agentic RAG Multi-Agent Components
 # ==========================================
 
-def call_llm(system_prompt: str, user_prompt: str, json_format: bool = False) -> str:
-    """Helper to send a prompt to the Ollama chat model, optionally enforcing JSON format."""
-    url = f"{OLLAMA_BASE}/api/chat"
+# Opt-in cache of non-streaming chat responses (set LLM_CACHE to enable)
+llm_cache = DiskLRUCache(config["llm_cache_path"], config["llm_cache_size"]) if config["llm_cache_path"] else None
+
+
+def _llm_cache_key(payload: dict) -> str:
+    """Hash of everything that determines a chat response: model, messages, options and format."""
+    request = {key: payload.get(key) for key in ("model", "messages", "options", "format")}
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def call_llm(system_prompt: str, user_prompt: str, json_format: bool = False, cancelled=None) -> str:
+    """
+    Helper to send a prompt to the Ollama chat model, optionally enforcing JSON format.
+    Responses are served from the LLM response cache when it is enabled.
+    With `cancelled` (a threading.Event) the response is streamed, and dropped
+    as soon as the event is set; "" is returned then.
+    """
     payload = {
         "model": config["chat_model"],
         "stream": False,
@@ -153,19 +637,107 @@ def call_llm(system_prompt: str, user_prompt: str, json_format: bool = False) ->
         ],
         "options": {
             "temperature": 0.1,  # Low temperature for deterministic behavior
+            "num_ctx": config["num_ctx"],
         }
     }
     if json_format:
         payload["format"] = "json"
-        
-    req = _make_request(url, payload)
-    try:
-        with urllib.request.urlopen(req) as res:
-            body = json.loads(res.read().decode("utf-8"))
-            return body["message"]["content"]
-    except Exception as e:
-        print(f"Error calling Ollama chat: {e}")
-        return ""
+
+    key = _llm_cache_key(payload) if llm_cache is not None else None
+    if key is not None:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached.decode("utf-8")
+    if cancelled is not None:
+        tokens = TokenStream(payload)
+        stream = iter(tokens)
+        try:
+            for _ in stream:
+                if cancelled.is_set():
+                    break
+        finally:
+            stream.close()  # an unfinished response closes its connection, which stops Ollama
+        record_llm_call(tokens.stats or {})
+        if cancelled.is_set() or tokens.stats is None:
+            return ""
+        content = tokens.text
+    else:
+        try:
+            body = post_ollama("/api/chat", payload)
+            content = body["message"]["content"]
+        except Exception as e:
+            print(f"Error calling Ollama chat: {e}")
+            return ""
+        record_llm_call(body)
+    if key is not None and content:
+        llm_cache.put(key, content.encode("utf-8"))
+    return content
+
+
+class TokenStream:
+    """
+    Iterable over the tokens of a streaming /api/chat response.
+
+    The request is sent when iteration starts. Afterwards `text` holds the full
+    answer, `ttft` the time to first token, `elapsed` the total time (seconds)
+    and `stats` the final response with Ollama's token counts. Callables
+    appended to `on_done` receive the full text once the stream completed
+    without error; callables appended to `on_close` receive the stream itself
+    when it ends either way.
+    """
+
+    def __init__(self, payload: dict):
+        self.payload = dict(payload, stream=True)
+        self.text = ""
+        self.ttft = None
+        self.elapsed = None
+        self.stats = None
+        self.on_done = []
+        self.on_close = []
+
+    def __iter__(self):
+        start = time.perf_counter()
+        try:
+            deadline = get_policy().deadline
+            with resident(self.payload["model"], deadline) as keep_alive:
+                payload = self.payload if keep_alive is None else dict(self.payload, keep_alive=keep_alive)
+                chunks = get_policy().stream(
+                    lambda timeout: ollama_pool.post_lines("/api/chat", payload, timeout=timeout),
+                    endpoint=OLLAMA_BASE, deadline=deadline - (time.perf_counter() - start),
+                )
+                for chunk in chunks:
+                    if chunk.get("done"):
+                        self.stats = chunk
+                    token = chunk.get("message", {}).get("content", "")
+                    if token:
+                        if self.ttft is None:
+                            self.ttft = time.perf_counter() - start
+                        self.text += token
+                        yield token
+        except Exception as e:
+            print(f"Error calling Ollama chat: {e}")
+            return
+        finally:
+            self.elapsed = time.perf_counter() - start
+            for callback in self.on_close:
+                callback(self)
+        for callback in self.on_done:
+            callback(self.text)
+
+
+def call_llm_stream(system_prompt: str, user_prompt: str) -> TokenStream:
+    """Streaming variant of call_llm: returns a TokenStream that yields tokens as they arrive."""
+    return TokenStream({
+        "model": config["chat_model"],
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "options": {
+            "temperature": 0.1,
+            "num_ctx": config["num_ctx"],
+        },
+    })
 
 
 def parse_json_response(response_text: str) -> dict:
@@ -271,8 +843,13 @@ def evaluate_context(question: str, snippets: list) -> dict:
     return res_json
 
 
-def synthesize_answer(question: str, snippets: list, is_fully_sufficient: bool, sufficiency_reason: str) -> str:
-    """Synthesis Agent: Generates final grounded response using retrieved context."""
+def synthesize_answer(question: str, snippets: list, is_fully_sufficient: bool, sufficiency_reason: str,
+                      stream: bool = False, cancelled=None):
+    """
+    Synthesis Agent: Generates final grounded response using retrieved context.
+    With stream=True a TokenStream is returned instead of the finished string;
+    with `cancelled` set (see call_llm) the answer is abandoned and "" returned.
+    """
     context_str = "\n\n---\n\n".join(snippets)
     if is_fully_sufficient:
         system_prompt = (
@@ -291,19 +868,79 @@ def synthesize_answer(question: str, snippets: list, is_fully_sufficient: bool,
         )
         user_prompt = f"Question: {question}"
         
-    return call_llm(system_prompt, user_prompt, json_format=False)
+    if stream:
+        return call_llm_stream(system_prompt, user_prompt)
+    return call_llm(system_prompt, user_prompt, json_format=False, cancelled=cancelled)
+
+
+# Tokens reserved for the agent system prompts around the packed context
+PROMPT_OVERHEAD_TOKENS = 400
+# Snippets retrieved per search query by the agent loop
+RETRIEVAL_TOPK = 3
+
+
+def pack_snippets(question: str, snippets: list, scores: dict) -> list:
+    """
+    Select the most relevant, non-duplicate snippets that fit the context
+    budget left by NUM_CTX after the prompt and the reply, and report anything
+    that was left out.
+    """
+    budget = config["num_ctx"] - config["answer_tokens"] - PROMPT_OVERHEAD_TOKENS - estimate_tokens(question)
+    packed = pack_context(snippets, scores, max(0, budget), config["near_duplicate_threshold"] or None)
+    print(f"   ↳ Context: {packed.summary()}")
+    for note in packed.warnings():
+        print(f"   ✂️  \033[93m[Context Packer]\033[0m {note.capitalize()}.")
+    return packed.snippets
+
+
+def run_agentic_rag(collection, question: str, stream: bool = False, speculative: bool | None = None, trace=None):
+    """
+    Orchestrates the Agentic RAG multi-step/multi-agent loop.
+    With stream=True the synthesis stage is streamed and a TokenStream is returned.
+    Every stage is recorded as a span of `trace` (a new Trace if not given).
+
+    With speculative=True (default SPECULATIVE) independent stages overlap:
+    retrieval for the raw question is prefetched while the planner runs, and
+    each sufficiency check runs next to a synthesis draft over the same
+    context. If the context is sufficient the draft is the answer (returned
+    as a finished string); otherwise it is cancelled. The speculative work
+    runs on threads of this question's own, so concurrent questions (server
+    mode) never wait for each other's drafts.
+    """
+    speculative = config["speculative"] if speculative is None else speculative
+    trace = trace if trace is not None else Trace(question)
+    if not speculative:
+        return _run_agentic_rag(collection, question, stream, trace, None)
+    # Two workers: a cancelled draft may still be winding down when the next one starts
+    speculation = ThreadPoolExecutor(max_workers=2)
+    try:
+        return _run_agentic_rag(collection, question, stream, trace, speculation)
+    finally:
+        speculation.shutdown(wait=False)
 
 
-def run_agentic_rag(collection, question: str) -> str:
-    """Orchestrates the Agentic RAG multi-step/multi-agent loop."""
+def _run_agentic_rag(collection, question, stream, trace, speculation):
+    scores = {}  # snippet -> relevance, accumulated over all retrieval rounds
+    prefetch = None
+    if speculation is not None:
+        prefetch = speculation.submit(trace.run, "retrieval (prefetch)",
+                                     search_multi_queries, collection, [question], RETRIEVAL_TOPK, scores)
+
     print("\n🧠 \033[94m[Planner]\033[0m Analyzing question and generating search plan...")
-    plan_res = plan_and_rewrite(question)
+    plan_res = trace.run("planner", plan_and_rewrite, question)
     print(f"   ↳ Plan: {plan_res.get('plan')}")
     print(f"   ↳ Initial Queries: {plan_res.get('queries')}")
 
     queries = plan_res.get('queries', [question])
     print("🔍 \033[92m[Retriever]\033[0m Searching vector store for queries...")
-    context_snippets = search_multi_queries(collection, queries, topk=3)
+    if prefetch is not None:
+        context_snippets = prefetch.result()
+        remaining = [q for q in queries if q.strip().lower() != question.strip().lower()]
+        for s in trace.run("retrieval", search_multi_queries, collection, remaining, topk=RETRIEVAL_TOPK, scores=scores):
+            if s not in context_snippets:
+                context_snippets.append(s)
+    else:
+        context_snippets = trace.run("retrieval", search_multi_queries, collection, queries, topk=RETRIEVAL_TOPK, scores=scores)
     print(f"   ↳ Found {len(context_snippets)} unique context snippet(s).")
 
     iteration = 0
@@ -311,6 +948,9 @@ def run_agentic_rag(collection, question: str) -> str:
     all_queries = list(queries)
     is_sufficient = True
     reason = ""
+    draft = None
+    draft_cancelled = None
+    packed = []
 
     while iteration < max_iterations:
         if not context_snippets:
@@ -320,7 +960,13 @@ def run_agentic_rag(collection, question: str) -> str:
             break
             
         print(f"🤖 \033[95m[Sufficiency Check]\033[0m Evaluating context sufficiency (Iteration {iteration + 1})...")
-        eval_res = evaluate_context(question, context_snippets)
+        packed = pack_snippets(question, context_snippets, scores)
+        if speculation is not None:
+            print("   ↳ Drafting an answer speculatively in parallel...")
+            draft_cancelled = threading.Event()
+            draft = speculation.submit(trace.run, "synthesis (speculative)",
+                                       synthesize_answer, question, packed, True, "", False, draft_cancelled)
+        eval_res = trace.run("sufficiency", evaluate_context, question, packed)
         
         is_sufficient = eval_res.get("is_sufficient", True)
         reason = eval_res.get("reason", "No reason provided.")
@@ -332,7 +978,10 @@ def run_agentic_rag(collection, question: str) -> str:
         if is_sufficient:
             print("✅ \033[92m[Sufficiency Check]\033[0m Context is fully sufficient!")
             break
-            
+        if draft is not None:
+            draft_cancelled.set()
+            draft = None
+
         iteration += 1
         if iteration >= max_iterations:
             print(f"⚠️  \033[91m[Iteration Limit]\033[0m Reached max iterations ({max_iterations}). Proceeding to synthesis with partial context.")
@@ -340,14 +989,15 @@ def run_agentic_rag(collection, question: str) -> str:
             
         print(f"🔄 \033[93m[Rewriter]\033[0m Context insufficient. Feedback: '{feedback}'")
         print("   Generating new queries based on feedback...")
-        rewrite_res = rewrite_with_feedback(question, all_queries, feedback)
+        rewrite_res = trace.run("rewriter", rewrite_with_feedback, question, all_queries, feedback)
         new_queries = rewrite_res.get("queries", [])
         print(f"   ↳ New queries: {new_queries}")
         
         all_queries.extend(new_queries)
         
         print("🔍 \033[92m[Retriever]\033[0m Retrieving additional context...")
-        new_snippets = search_multi_queries(collection, new_queries, topk=3)
+        new_snippets = trace.run("retrieval", search_multi_queries, collection, new_queries,
+                                   topk=RETRIEVAL_TOPK, scores=scores)
         
         added_count = 0
         for s in new_snippets:
@@ -356,13 +1006,100 @@ def run_agentic_rag(collection, question: str) -> str:
                 added_count += 1
         print(f"   ↳ Found {added_count} new unique snippet(s). Total unique snippets: {len(context_snippets)}.")
 
+    if draft is not None:
+        answer = draft.result()
+        if answer:
+            print("✍️  \033[96m[Synthesis]\033[0m Using the draft written during the sufficiency check.")
+            print(f"⏱️  \033[90m[Timing]\033[0m {trace.summary()}")
+            return answer
+
     print("✍️  \033[96m[Synthesis]\033[0m Generating final response...")
-    answer = synthesize_answer(question, context_snippets, is_sufficient, reason)
+    if stream:
+        span = trace.begin("synthesis")
+        answer = synthesize_answer(question, packed, is_sufficient, reason, stream=True)
+        answer.on_close.append(lambda tokens: trace.end(span, tokens.stats))
+    else:
+        answer = trace.run("synthesis", synthesize_answer, question, packed, is_sufficient, reason)
+    print(f"⏱️  \033[90m[Timing]\033[0m {trace.summary()}")
+    return answer
+
+
+# Finished per-question traces (written to TRACE_FILE when set)
+trace_log = TraceLog(config["trace_path"], keep=10000 if config["trace_summary"] else 0)
+
+
+def finish_trace(trace):
+    trace.finish()
+    trace_log.add(trace)
+
+
+answer_cache = SemanticAnswerCache(
+    config["answer_cache_path"],
+    threshold=config["answer_cache_threshold"],
+    ttl=config["answer_cache_ttl"],
+    max_entries=config["answer_cache_size"],
+) if config["answer_cache_size"] > 0 else None
+
+
+def answer_cache_version(collection):
+    """
+    Version a cached answer is tied to: the index version of `collection` and
+    every setting besides the indexed content that changes the answers.
+    """
+    state = [
+        index_versions.get(collection.path, ""),
+        config["chat_model"],
+        config["retrieval_mode"],
+        RETRIEVAL_TOPK,
+        config["num_ctx"],
+        config["answer_tokens"],
+        config["speculative"],
+        config["rescore_fp32"],
+        config["rescore_factor"],
+    ]
+    return hashlib.sha256(json.dumps(state).encode("utf-8")).hexdigest()[:16]
+
+
+def answer_question(collection, question: str, stream: bool = False):
+    """
+    Answer a question through the semantic answer cache (if ANSWER_CACHE_SIZE
+    is set): if a previous question against the same index version and answer
+    settings is similar enough, its answer is returned without any LLM call;
+    otherwise run_agentic_rag answers it and the answer is cached.
+    The question's trace is added to `trace_log` once the answer is complete.
+    """
+    trace = Trace(question)
+    vector = cached = None
+    if answer_cache is not None:
+        version = answer_cache_version(collection)
+        with trace.stage("answer cache"):
+            vector = get_embedding(question)
+            cached = answer_cache.lookup(vector, version) if vector is not None else None
+    trace.attributes["answer_cache_hit"] = cached is not None
+    if cached is not None:
+        answer, cached_question, similarity = cached
+        print(f"\n⚡ \033[92m[Answer Cache]\033[0m Reusing the answer to '{cached_question}' "
+              f"(similarity {similarity:.3f}).")
+        finish_trace(trace)
+        return answer
+
+    answer = run_agentic_rag(collection, question, stream=stream, trace=trace)
+    if isinstance(answer, TokenStream):
+        if vector is not None:
+            answer.on_done.append(lambda text: answer_cache.store(question, vector, text, version))
+        answer.on_close.append(lambda tokens: finish_trace(trace))
+    else:
+        if vector is not None:
+            answer_cache.store(question, vector, answer, version)
+        finish_trace(trace)
     return answer
 
 
-def ask_ollama(question, context_chunks):
-    """Legacy helper function to send retrieved chunks + user question to the Ollama chat model."""
+def ask_ollama(question, context_chunks, stream=False):
+    """
+    Legacy helper function to send retrieved chunks + user question to the Ollama chat model.
+    With stream=True a TokenStream is returned instead of the finished string.
+    """
     context = "\n\n---\n\n".join(context_chunks)
     system_prompt = (
         "You are a helpful assistant. Answer the user's question using ONLY "
@@ -370,7 +1107,6 @@ def ask_ollama(question, context_chunks):
         "information, say so. Be concise and accurate.\n\n"
         f"Context:\n{context}"
     )
-    url = f"{OLLAMA_BASE}/api/chat"
     payload = {
         "model": config["chat_model"],
         "stream": False,
@@ -379,16 +1115,17 @@ def ask_ollama(question, context_chunks):
             {"role": "user", "content": question},
         ],
     }
-    req = _make_request(url, payload)
+    if stream:
+        return TokenStream(payload)
     try:
-        with urllib.request.urlopen(req) as res:
-            body = json.loads(res.read().decode("utf-8"))
-            return body["message"]["content"]
+        body = post_ollama("/api/chat", payload)
+        return body["message"]["content"]
     except Exception as e:
         return f"Error calling Ollama chat: {e}"
 
 
 def main():
+    get_residency()  # starts preloading OLLAMA_RESIDENT_MODELS while the index is built
     print("Building zvec index from text files …")
     collection = build_index()
     print(f"\nAgentic RAG chat ready  (model: {config['chat_model']})")
@@ -404,8 +1141,24 @@ def main():
             print("Goodbye!")
             break
 
-        answer = run_agentic_rag(collection, question)
-        print(f"\nAssistant> {answer}\n")
+        answer = answer_question(collection, question, stream=config["stream"])
+        if isinstance(answer, TokenStream):
+            print("\nAssistant> ", end="", flush=True)
+            for token in answer:
+                print(token, end="", flush=True)
+            ttft = f"{answer.ttft:.2f}s" if answer.ttft is not None else "n/a"
+            print(f"\n   ↳ Time to first token: {ttft}, total: {answer.elapsed:.2f}s\n")
+        else:
+            print(f"\nAssistant> {answer}\n")
+
+    if llm_cache is not None:
+        print(f"LLM response cache: {llm_cache.stats()}")
+    if retrieval_duplicates["checked"]:
+        print(f"Near-duplicate filter: skipped {retrieval_duplicates['skipped']} of "
+              f"{retrieval_duplicates['checked']} retrieved chunk(s)")
+    if config["trace_summary"] and trace_log.records:
+        print(f"\nLatency per stage over {len(trace_log.records)} question(s):")
+        print(format_summary(trace_log.records))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+"""
+Recall-vs-memory benchmark for the quantized vector storage modes.
+
+Builds zvec collections over the same synthetic, clustered unit vectors
+(768 dimensions, like embeddinggemma) in every storage mode and compares
+their top-k results with exact search over a FLAT float32 collection.
+No Ollama server is needed.
+
+    uv run benchmark_quantization.py
+    BENCH_VECTORS=100000 BENCH_QUERIES=200 uv run benchmark_quantization.py
+"""
+
+import math
+import os
+import random
+import shutil
+import time
+
+import zvec
+from quantize import bytes_per_vector, decode_vector, dot, encode_query, encode_vector
+
+DIMENSION = 768
+NUM_VECTORS = int(os.getenv("BENCH_VECTORS", "20000"))
+NUM_QUERIES = int(os.getenv("BENCH_QUERIES", "100"))
+NUM_CLUSTERS = 50
+TOPK = 10
+RESCORE_FACTOR = 4
+BENCH_DIR = "./quantization_benchmark"
+
+VECTOR_TYPES = {
+    "fp32": zvec.DataType.VECTOR_FP32,
+    "fp16": zvec.DataType.VECTOR_FP16,
+    "int8": zvec.DataType.VECTOR_INT8,
+}
+
+
+def unit(vector):
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def synthetic_vectors(rng, count, centers, noise=0.75):
+    """
+    Unit vectors scattered around random cluster centers, like topic-clustered
+    text embeddings (cosine similarity to their center is about 0.8).
+    """
+    vectors = []
+    sigma = noise / math.sqrt(DIMENSION)
+    for _ in range(count):
+        center = rng.choice(centers)
+        vectors.append(unit([c + rng.gauss(0, sigma) for c in center]))
+    return vectors
+
+
+def create_collection(name, storage, index_param=None):
+    path = os.path.join(BENCH_DIR, name)
+    shutil.rmtree(path, ignore_errors=True)
+    fields = [zvec.FieldSchema("scale", zvec.DataType.FLOAT)] if storage == "int8" else None
+    schema = zvec.CollectionSchema(
+        name=name,
+        vectors=zvec.VectorSchema("embedding", VECTOR_TYPES[storage], DIMENSION, index_param=index_param),
+        fields=fields,
+    )
+    return zvec.create_and_open(path=path, schema=schema)
+
+
+def load(collection, storage, vectors, batch_size=512):
+    start = time.perf_counter()
+    for i in range(0, len(vectors), batch_size):
+        docs = []
+        for j, vector in enumerate(vectors[i:i + batch_size], start=i):
+            stored, scale = encode_vector(vector, storage)
+            fields = {"scale": scale} if storage == "int8" else None
+            docs.append(zvec.Doc(id=f"v{j}", vectors={"embedding": stored}, fields=fields))
+        collection.insert(docs)
+    collection.flush()
+    return time.perf_counter() - start
+
+
+def search(collection, storage, query, vectors, rescore):
+    """Top-k ids, re-ranking RESCORE_FACTOR * k candidates like vector_hits in app.py."""
+    if storage == "fp32":
+        return [res.id for res in collection.query(zvec.VectorQuery("embedding", vector=query), topk=TOPK)]
+    results = collection.query(
+        zvec.VectorQuery("embedding", vector=encode_query(query, storage)),
+        topk=TOPK * RESCORE_FACTOR,
+        include_vector=rescore == "decoded",
+    )
+    scored = []
+    for res in results:
+        scale = res.fields.get("scale", 1.0) if res.fields else 1.0
+        if rescore == "exact":
+            score = dot(query, vectors[int(res.id[1:])])
+        elif rescore == "decoded":
+            score = dot(query, decode_vector(res.vectors["embedding"], scale, storage))
+        else:
+            score = res.score * scale
+        scored.append((score, res.id))
+    scored.sort(reverse=True)
+    return [doc_id for _, doc_id in scored[:TOPK]]
+
+
+def disk_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def main():
+    rng = random.Random(42)
+    centers = [unit([rng.gauss(0, 1) for _ in range(DIMENSION)]) for _ in range(NUM_CLUSTERS)]
+    print(f"Generating {NUM_VECTORS} vectors and {NUM_QUERIES} queries ({DIMENSION} dimensions) …")
+    vectors = synthetic_vectors(rng, NUM_VECTORS, centers)
+    queries = synthetic_vectors(rng, NUM_QUERIES, centers)
+
+    truth_collection = create_collection("truth", "fp32", zvec.FlatIndexParam())
+    load(truth_collection, "fp32", vectors)
+    truth = [set(search(truth_collection, "fp32", q, vectors, None)) for q in queries]
+
+    runs = [
+        ("fp32", None),
+        ("fp16", None),
+        ("fp16", "exact"),
+        ("int8", None),
+        ("int8", "decoded"),
+        ("int8", "exact"),
+    ]
+    print(f"\n{'storage':<8} {'re-score':<9} {'bytes/vec':>9} {'disk MB':>8} {'load s':>7} "
+          f"{'query ms':>9} {f'recall@{TOPK}':>10}")
+    collections = {}
+    for storage, rescore in runs:
+        if storage not in collections:
+            collection = create_collection(f"bench_{storage}", storage)
+            collections[storage] = (collection, load(collection, storage, vectors))
+        collection, load_seconds = collections[storage]
+        start = time.perf_counter()
+        found = [search(collection, storage, q, vectors, rescore) for q in queries]
+        query_ms = (time.perf_counter() - start) / len(queries) * 1000
+        recall = sum(len(truth[i] & set(ids)) for i, ids in enumerate(found)) / (TOPK * len(queries))
+        print(f"{storage:<8} {rescore or '-':<9} {bytes_per_vector(storage, DIMENSION):>9} "
+              f"{disk_size(collection.path) / 1e6:>8.1f} {load_seconds:>7.1f} {query_ms:>9.2f} {recall:>10.3f}")
+
+    shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
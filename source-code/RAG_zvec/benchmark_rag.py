@@ -0,0 +1,148 @@
+"""
+Offline throughput benchmark of the RAG pipeline against a fake Ollama server.
+
+Starts fake_ollama.FakeOllama on a free local port, points app.py at it with
+OLLAMA_HOST, and for synthetic corpora of increasing size measures ingestion
+(chunks/sec of build_index), plain search latency (search) and full agent
+loop latency (run_agentic_rag) with the number of chat calls per question.
+No GPU or model server is needed, so regressions in the pipeline itself show
+up as changes in these numbers.
+
+    uv run benchmark_rag.py
+    BENCH_FILES=100,1000 FAKE_CHAT_LATENCY=0.2 uv run benchmark_rag.py
+"""
+
+import contextlib
+import io
+import os
+import random
+import shutil
+import time
+
+from fake_ollama import FakeOllama
+from tracing import percentile
+
+BENCH_DIR = os.path.abspath("./rag_benchmark")
+FILE_COUNTS = [int(n) for n in os.getenv("BENCH_FILES", "25,100,400").split(",")]
+NUM_QUESTIONS = int(os.getenv("BENCH_QUESTIONS", "20"))
+PARAGRAPHS_PER_FILE = 4
+NUM_TOPICS = 40
+
+SYLLABLES = ["ka", "lo", "mi", "ren", "tas", "vo", "shi", "pa", "dor", "el", "qu", "zan", "bri", "tol", "fe", "nu"]
+COMMON_WORDS = ["the", "of", "and", "to", "in", "is", "was", "for", "on", "that", "with", "as",
+                "by", "are", "from", "at", "which", "this", "it", "an", "be", "has", "have", "its",
+                "were", "their", "also", "more", "most", "other", "such", "into", "between",
+                "during", "after"]
+
+
+def make_vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_topics(rng):
+    """Each topic is a name and a pool of words its documents are mostly written in."""
+    vocabulary = make_vocabulary(rng, NUM_TOPICS * 40)
+    return [(vocabulary[i * 40], vocabulary[i * 40:(i + 1) * 40]) for i in range(NUM_TOPICS)]
+
+
+def make_paragraph(rng, topic_words):
+    sentences = []
+    for _ in range(rng.randint(4, 7)):
+        words = [rng.choice(topic_words) if rng.random() < 0.6 else rng.choice(COMMON_WORDS)
+                 for _ in range(rng.randint(8, 16))]
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def write_corpus(path, num_files, topics, seed):
+    """Write num_files synthetic documents, each about one topic, under `path`."""
+    rng = random.Random(seed)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    for i in range(num_files):
+        name, words = topics[i % len(topics)]
+        paragraphs = [make_paragraph(rng, words) for _ in range(PARAGRAPHS_PER_FILE)]
+        with open(os.path.join(path, f"{name}_{i:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(f"{name.capitalize()}\n\n" + "\n\n".join(paragraphs) + "\n")
+
+
+def make_questions(rng, topics):
+    questions = []
+    for _ in range(NUM_QUESTIONS):
+        name, words = rng.choice(topics)
+        questions.append(f"What is known about {name} and {rng.choice(words)}?")
+    return questions
+
+
+def timed(fn, *args, **kwargs):
+    """(seconds, result) of fn(*args, **kwargs), with the pipeline's progress output suppressed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    fake = FakeOllama(
+        chat_latency=float(os.getenv("FAKE_CHAT_LATENCY", "0.05")),
+        token_latency=float(os.getenv("FAKE_TOKEN_LATENCY", "0.0")),
+        embed_latency=float(os.getenv("FAKE_EMBED_LATENCY", "0.0")),
+        sufficient_rate=float(os.getenv("FAKE_SUFFICIENT_RATE", "0.5")),
+    ).start()
+
+    # app.py reads its configuration at import time
+    shutil.rmtree(BENCH_DIR, ignore_errors=True)
+    os.makedirs(BENCH_DIR)
+    os.environ.update({
+        "OLLAMA_HOST": fake.url,
+        "EMBEDDING_CACHE": os.path.join(BENCH_DIR, "embedding_cache.sqlite"),
+        "EMBEDDING_CACHE_SIZE": "0",  # every chunk is embedded through the fake server
+        "ANSWER_CACHE": os.path.join(BENCH_DIR, "answer_cache.sqlite"),
+        "ANSWER_CACHE_SIZE": "0",
+        "LLM_CACHE": "",
+        "TRACE_FILE": "",
+    })
+    import app
+
+    rng = random.Random(42)
+    topics = make_topics(rng)
+    questions = make_questions(rng, topics)
+    print(f"Fake Ollama at {fake.url}: {fake.chat_latency * 1000:.0f} ms per chat call, "
+          f"{fake.embed_latency * 1000:.0f} ms per embed call; {len(questions)} questions per corpus\n")
+    print(f"{'files':>6} {'chunks':>7} {'ingest s':>9} {'chunks/s':>9} {'search p50 ms':>14} "
+          f"{'search p95 ms':>14} {'question p50 s':>15} {'question p95 s':>15} {'LLM calls/q':>12}")
+
+    for num_files in FILE_COUNTS:
+        data_dir = os.path.join(BENCH_DIR, f"corpus_{num_files}")
+        write_corpus(data_dir, num_files, topics, seed=num_files)
+        app.config["data_dir"] = data_dir
+        app.config["db_path"] = os.path.join(BENCH_DIR, f"index_{num_files}")
+
+        ingest_seconds, collection = timed(app.build_index)
+        manifest = app.load_manifest(app.config["db_path"]) or {"files": {}}
+        chunks = sum(len(entry["chunk_ids"]) for entry in manifest["files"].values())
+
+        search_ms = [timed(app.search, collection, question)[0] * 1000 for question in questions]
+
+        question_seconds = []
+        chat_calls = 0
+        for question in questions:
+            before = fake.calls["/api/chat"]
+            seconds, _ = timed(app.run_agentic_rag, collection, question, stream=False)
+            question_seconds.append(seconds)
+            chat_calls += fake.calls["/api/chat"] - before
+
+        print(f"{num_files:>6} {chunks:>7} {ingest_seconds:>9.2f} {chunks / ingest_seconds:>9.1f} "
+              f"{percentile(search_ms, 50):>14.1f} {percentile(search_ms, 95):>14.1f} "
+              f"{percentile(question_seconds, 50):>15.2f} {percentile(question_seconds, 95):>15.2f} "
+              f"{chat_calls / len(questions):>12.2f}")
+
+    fake.stop()
+    shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+In-memory BM25 inverted index kept next to the zvec collection.
+
+Vector search is weak on exact terms such as names, codes and numbers. This
+side index scores chunks with Okapi BM25 so they can be fused with the vector
+results (see reciprocal_rank_fusion). It supports incremental add/remove so it
+follows the incremental zvec index, and is persisted as a JSON snapshot plus
+a change log (see journal.py).
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+
+from journal import ChangeLog, read_log
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list:
+    """Lowercased word and number tokens."""
+    return TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over chunk ids, with postings lists for fast term lookup."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_terms = {}    # doc id -> {term: term frequency}
+        self.doc_lengths = {}  # doc id -> number of tokens
+        self.postings = {}     # term -> {doc id: term frequency}
+        self.total_length = 0
+        self._log = ChangeLog()
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def add(self, doc_id: str, text: str):
+        """Index (or re-index) a chunk."""
+        if doc_id in self.doc_terms:
+            self._remove(doc_id)
+        terms = Counter(tokenize(text))
+        self._add_terms(doc_id, terms)
+        self._log.record("add", doc_id, terms)
+
+    def _add_terms(self, doc_id, terms):
+        self.doc_terms[doc_id] = terms
+        length = sum(terms.values())
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id: str):
+        if doc_id in self.doc_terms:
+            self._remove(doc_id)
+            self._log.record("remove", doc_id)
+
+    def _remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        for term in terms:
+            docs = self.postings[term]
+            del docs[doc_id]
+            if not docs:
+                del self.postings[term]
+
+    def search(self, query: str, topk: int = 5) -> list:
+        """Return up to `topk` (doc id, score) pairs, best first."""
+        n = len(self.doc_terms)
+        if not n:
+            return []
+        avg_length = self.total_length / n
+        scores = Counter()
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores.most_common(topk)
+
+    def save(self, path: str):
+        """Write a full snapshot to `path` (and drop its change log)."""
+        self._log.take()
+        log_id = ChangeLog.new_id()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "docs": self.doc_terms, "log": log_id}, f)
+        os.replace(tmp_path, path)
+        self._log.saved(path, log_id)
+
+    def save_changes(self, path: str):
+        """Persist the changes since the last save, usually by appending them to the change log."""
+        self._log.persist(path, self._log.take(), self.save)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(data["k1"], data["b"])
+        for doc_id, terms in data["docs"].items():
+            index._add_terms(doc_id, terms)
+        for op, doc_id, *terms in read_log(path, data.get("log")):
+            index._remove(doc_id)
+            if op == "add":
+                index._add_terms(doc_id, terms[0])
+        index._log.attach(path, data.get("log"))
+        return index
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 60) -> list:
+    """
+    Fuse several ranked lists of doc ids: score(d) = sum over lists of 1 / (k + rank).
+    Returns the doc ids ordered by fused score.
+    """
+    scores = Counter()
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return [doc_id for doc_id, _ in scores.most_common()]
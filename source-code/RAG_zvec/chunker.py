@@ -0,0 +1,128 @@
+"""
+Token-aware text chunker that respects paragraph and sentence boundaries.
+
+Chunks are described by (start, end) character offsets into the source text
+instead of string copies. All candidate boundaries are found in a single
+regex pass and each chunk end is snapped to the best boundary with a binary
+search, so chunking costs O(n + chunks * log boundaries).
+
+Token counts are estimated from character counts (about 4 characters per
+token for English text with typical embedding-model tokenizers), which is
+accurate enough to keep chunks under the embedding model's context limit.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+
+CHARS_PER_TOKEN = 4
+
+PARAGRAPH_END = re.compile(r"\n[ \t]*\n\s*")
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+")
+WORD_END = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str, chars_per_token: float = CHARS_PER_TOKEN) -> int:
+    """Rough token count of `text`."""
+    return int(len(text) / chars_per_token + 0.999)
+
+
+def _boundaries(pattern, text):
+    """Offsets just past every match of `pattern`, i.e. where a new chunk may start."""
+    return [m.end() for m in pattern.finditer(text)]
+
+
+def _snap_back(boundaries, low, high):
+    """Largest boundary in (low, high], or None."""
+    i = bisect_right(boundaries, high)
+    if i and boundaries[i - 1] > low:
+        return boundaries[i - 1]
+    return None
+
+
+def _snap_forward(boundaries, low, high):
+    """Smallest boundary in [low, high), or None."""
+    i = bisect_left(boundaries, low)
+    if i < len(boundaries) and boundaries[i] < high:
+        return boundaries[i]
+    return None
+
+
+def chunk_offsets(text: str, max_tokens: int = 128, overlap_tokens: int = 12,
+                  chars_per_token: float = CHARS_PER_TOKEN) -> list:
+    """
+    Split `text` into chunks of at most `max_tokens` (estimated) tokens and
+    return their (start, end) offsets.
+
+    Chunk ends prefer a paragraph break, then a sentence end, then whitespace,
+    and are never placed in the first half of the window, so chunks stay close
+    to the budget. Consecutive chunks overlap by about `overlap_tokens`, with the
+    overlap starting on a sentence or word boundary.
+    """
+    max_chars = max(1, int(max_tokens * chars_per_token))
+    overlap_chars = int(overlap_tokens * chars_per_token)
+    n = len(text)
+    paragraphs = _boundaries(PARAGRAPH_END, text)
+    sentences = _boundaries(SENTENCE_END, text)
+    words = _boundaries(WORD_END, text)
+
+    offsets = []
+    start = 0
+    while start < n:
+        limit = start + max_chars
+        if limit >= n:
+            offsets.append((start, n))
+            break
+        floor = start + max_chars // 2
+        end = (
+            _snap_back(paragraphs, floor, limit)
+            or _snap_back(sentences, floor, limit)
+            or _snap_back(words, floor, limit)
+            or limit
+        )
+        offsets.append((start, end))
+        if not overlap_chars:
+            start = end
+            continue
+        target = max(end - overlap_chars, start + 1)
+        start = (
+            _snap_forward(sentences, target, end)
+            or _snap_forward(words, target, end)
+            or target
+        )
+    return offsets
+
+
+def chunk_text(text: str, max_tokens: int = 128, overlap_tokens: int = 12) -> list:
+    """Split text into overlapping, boundary-aligned chunks and return them as strings."""
+    return [text[start:end] for start, end in chunk_offsets(text, max_tokens, overlap_tokens)]
+
+
+def iter_file_chunks(path, max_tokens: int = 128, overlap_tokens: int = 12,
+                     block_chars: int = 1 << 20, encoding: str = "utf-8"):
+    """
+    Stream (start, end, text) chunks from a file without loading it whole.
+
+    The file is read in blocks of `block_chars` characters. Offsets are
+    character offsets into the whole file. Only the unfinished tail of each
+    block is carried over to the next one, so peak memory is about one block.
+    """
+    buffer = ""
+    base = 0
+    with open(path, "r", encoding=encoding) as f:
+        while True:
+            block = f.read(block_chars)
+            at_eof = not block
+            buffer += block
+            offsets = chunk_offsets(buffer, max_tokens, overlap_tokens)
+            if at_eof:
+                for start, end in offsets:
+                    yield base + start, base + end, buffer[start:end]
+                return
+            # The last chunk may continue in the next block: keep it in the
+            # buffer and re-chunk it once more text has been read.
+            for start, end in offsets[:-1]:
+                yield base + start, base + end, buffer[start:end]
+            if len(offsets) > 1:
+                cut = offsets[-1][0]
+                buffer = buffer[cut:]
+                base += cut
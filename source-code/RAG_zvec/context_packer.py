@@ -0,0 +1,86 @@
+"""
+Token-budgeted context packing for the sufficiency and synthesis prompts.
+
+Every rewrite round adds snippets, so joining all of them makes prompts grow
+until they overflow the model's context window, where Ollama silently drops
+the beginning of the prompt. The packer ranks snippets by relevance, skips
+near-duplicates and adds snippets until a token budget is filled. Everything
+it leaves out is reported, so context is never cut without notice.
+"""
+
+from chunker import estimate_tokens
+from minhash import MinHashLSH, minhash_signature
+
+SEPARATOR = "\n\n---\n\n"
+
+
+class PackedContext:
+    """Result of pack_context: the snippets that fit and what was left out."""
+
+    def __init__(self, budget_tokens: int):
+        self.budget_tokens = budget_tokens
+        self.snippets = []
+        self.tokens = 0
+        self.duplicates = 0        # near-duplicates of a packed snippet
+        self.over_budget = 0       # snippets that did not fit
+        self.over_budget_tokens = 0
+        self.truncated = 0         # snippets cut to fit (only if nothing else fits)
+
+    @property
+    def text(self) -> str:
+        return SEPARATOR.join(self.snippets)
+
+    def summary(self) -> str:
+        return f"{len(self.snippets)} snippet(s), {self.tokens} of {self.budget_tokens} tokens"
+
+    def warnings(self) -> list:
+        """Human-readable notes about every snippet that was dropped or shortened."""
+        notes = []
+        if self.duplicates:
+            notes.append(f"skipped {self.duplicates} near-duplicate snippet(s)")
+        if self.over_budget:
+            notes.append(f"dropped {self.over_budget} lower-ranked snippet(s) "
+                         f"(~{self.over_budget_tokens} tokens) over the {self.budget_tokens}-token budget")
+        if self.truncated:
+            notes.append(f"truncated {self.truncated} snippet(s) larger than the whole budget")
+        return notes
+
+
+def pack_context(snippets: list, scores: dict, budget_tokens: int,
+                 duplicate_threshold: float = 0.8) -> PackedContext:
+    """
+    Pick snippets for a prompt, most relevant first.
+
+    `scores` maps snippet text to a relevance score (higher is better; missing
+    snippets score 0 and keep their original order). A snippet whose estimated
+    (MinHash) Jaccard similarity to an already packed snippet is at least
+    `duplicate_threshold` is skipped; None disables the check. Snippets are
+    added while the estimated tokens, separators included, stay within
+    `budget_tokens`; if even the best snippet does not fit, it is truncated to
+    the budget and reported.
+    """
+    packed = PackedContext(budget_tokens)
+    separator_tokens = estimate_tokens(SEPARATOR)
+    ranked = sorted(enumerate(snippets), key=lambda item: (-scores.get(item[1], 0.0), item[0]))
+    dedup = MinHashLSH(duplicate_threshold) if duplicate_threshold else None
+    for i, snippet in ranked:
+        if dedup is not None:
+            signature = minhash_signature(snippet)
+            if dedup.find(signature) is not None:
+                packed.duplicates += 1
+                continue
+        cost = estimate_tokens(snippet) + (separator_tokens if packed.snippets else 0)
+        if packed.tokens + cost > budget_tokens:
+            if not packed.snippets and budget_tokens > 0:
+                snippet = snippet[:int(budget_tokens * len(snippet) / cost)].rsplit(" ", 1)[0]
+                cost = estimate_tokens(snippet)
+                packed.truncated += 1
+            else:
+                packed.over_budget += 1
+                packed.over_budget_tokens += cost
+                continue
+        packed.snippets.append(snippet)
+        packed.tokens += cost
+        if dedup is not None:
+            dedup.add(i, signature)
+    return packed
@@ -0,0 +1,93 @@
+"""
+Small persistent key/value cache with LRU eviction, stored in a SQLite file.
+
+Keys are strings (typically content hashes) and values are raw bytes, so the
+same class backs the embedding cache and any other cache the RAG app needs.
+Standard library only, and safe to share between threads.
+"""
+
+import sqlite3
+import threading
+import time
+
+
+class DiskLRUCache:
+    """SQLite-backed bytes cache bounded to `max_entries`, evicting least recently used entries."""
+
+    def __init__(self, path: str, max_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_last_used ON cache (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def get(self, key: str):
+        """Return the cached bytes for `key`, or None."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: list) -> dict:
+        """Return {key: bytes} for the keys present in the cache and mark them as recently used."""
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({marks})", part
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE cache SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, key: str, value: bytes):
+        self.put_many({key: value})
+
+    def put_many(self, items: dict):
+        """Store {key: bytes} and evict the least recently used entries beyond `max_entries`."""
+        if not items or self.max_entries <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO cache (key, value, last_used) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items.items()],
+            )
+            self._count += self._conn.total_changes - before
+            overflow = self._count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self._count -= overflow
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+            self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def stats(self) -> str:
+        return f"{self._count} entries, {self.hits} hits, {self.misses} misses"
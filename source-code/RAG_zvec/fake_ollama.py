@@ -0,0 +1,217 @@
+"""
+Local stand-in for the Ollama HTTP API, for benchmarks and offline runs.
+
+Serves /api/embed, /api/chat (streaming and not), /api/tags and /api/version.
+Embeddings are deterministic: words are hashed into the 768 dimensions and the
+vector is normalized, so texts sharing words get similar vectors and retrieval
+behaves sensibly. Chat replies are canned, chosen by the agent's system prompt:
+the planner and rewriter return queries built from the question, and the
+sufficiency agent says "sufficient" for a deterministic SUFFICIENT_RATE share
+of prompts. Every call sleeps for the configured latency and reports token
+counts like Ollama does.
+
+    uv run fake_ollama.py          # serves on 127.0.0.1:11435
+    OLLAMA_HOST=http://127.0.0.1:11435 uv run app.py
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DIMENSION = 768
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def fake_embedding(text: str) -> list:
+    """Unit vector of hashed word counts (signed feature hashing)."""
+    vector = [0.0] * DIMENSION
+    for word in WORD_RE.findall(text.lower()):
+        h = zlib.crc32(word.encode("utf-8"))
+        vector[h % DIMENSION] += 1.0 if h & 0x80000000 else -1.0
+    norm = math.sqrt(sum(x * x for x in vector))
+    if not norm:
+        vector[0], norm = 1.0, 1.0
+    return [x / norm for x in vector]
+
+
+def count_tokens(text: str) -> int:
+    return max(1, round(len(text.split()) * 1.3))
+
+
+class FakeOllama:
+    """
+    Fake Ollama server running in a background thread. `calls` counts requests
+    per API path; `url` is the base URL to point OLLAMA_HOST at.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, chat_latency: float = 0.0,
+                 token_latency: float = 0.0, embed_latency: float = 0.0, sufficient_rate: float = 0.5):
+        self.chat_latency = chat_latency  # seconds per chat call before the first token
+        self.token_latency = token_latency  # seconds per generated token
+        self.embed_latency = embed_latency  # seconds per /api/embed call
+        self.sufficient_rate = sufficient_rate  # share of sufficiency checks answered "sufficient"
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve in the calling thread (for running the fake on its own)."""
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, path: str):
+        with self._lock:
+            self.calls[path] += 1
+
+    def reply(self, messages: list) -> str:
+        """Canned reply for the agent whose system prompt opens the conversation."""
+        system = messages[0]["content"] if messages else ""
+        user = messages[-1]["content"] if messages else ""
+        question = _field(user, "Question") or _field(user, "Original Question") or user
+        if "Plan and Query Rewriter" in system:
+            return json.dumps({
+                "plan": f"Search for background on: {question}",
+                "queries": [question, f"{question} overview"],
+            })
+        if "Query Rewriter" in system:
+            return json.dumps({"queries": [f"{question} details", f"{question} examples"]})
+        if "Sufficient Context" in system:
+            digest = hashlib.sha256(user.encode("utf-8")).digest()
+            sufficient = int.from_bytes(digest[:4], "big") / 2**32 < self.sufficient_rate
+            return json.dumps({
+                "is_sufficient": sufficient,
+                "reason": "The snippets cover the question." if sufficient else "Some aspects are missing.",
+                "feedback": "" if sufficient else f"Find more specific facts about {question}",
+            })
+        return (f"Based on the provided context, here is what is known about {question} "
+                "and the points the retrieved snippets make about it.")
+
+
+def _field(text: str, label: str) -> str:
+    """Value of a 'Label: value' line in an agent's user prompt, if present."""
+    match = re.search(rf"^{re.escape(label)}:\s*(.+)$", text, re.MULTILINE)
+    return match.group(1).strip() if match else ""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        fake = self.server.fake
+        fake.count(self.path)
+        if self.path == "/api/tags":
+            self.send_json({"models": []})
+        elif self.path == "/api/version":
+            self.send_json({"version": "0.0.0-fake"})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        fake = self.server.fake
+        fake.count(self.path)
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path == "/api/embed":
+            inputs = body.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            time.sleep(fake.embed_latency)
+            self.send_json({
+                "model": body.get("model"),
+                "embeddings": [fake_embedding(text) for text in inputs],
+                "prompt_eval_count": sum(count_tokens(text) for text in inputs),
+            })
+        elif self.path == "/api/chat":
+            self.chat(fake, body)
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def chat(self, fake, body):
+        messages = body.get("messages", [])
+        content = fake.reply(messages)
+        tokens = [word + " " for word in content.split(" ")]
+        prompt_tokens = sum(count_tokens(m.get("content", "")) for m in messages)
+        start = time.perf_counter()
+        time.sleep(fake.chat_latency)
+        first = time.perf_counter()
+
+        def final(extra):
+            now = time.perf_counter()
+            return {
+                "model": body.get("model"), "done": True, **extra,
+                "total_duration": int((now - start) * 1e9),
+                "prompt_eval_count": prompt_tokens, "prompt_eval_duration": int((first - start) * 1e9),
+                "eval_count": len(tokens), "eval_duration": max(1, int((now - first) * 1e9)),
+            }
+
+        if body.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for token in tokens:
+                    time.sleep(fake.token_latency)
+                    self.send_chunk({"model": body.get("model"),
+                                     "message": {"role": "assistant", "content": token}, "done": False})
+                self.send_chunk(final({"message": {"role": "assistant", "content": ""}}))
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # the client dropped the response, as Ollama allows
+            return
+        time.sleep(fake.token_latency * len(tokens))
+        self.send_json(final({"message": {"role": "assistant", "content": content}}))
+
+    def send_chunk(self, payload: dict):
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def send_json(self, payload: dict, status: int = 200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+if __name__ == "__main__":
+    fake = FakeOllama(
+        port=int(os.getenv("FAKE_OLLAMA_PORT", "11435")),
+        chat_latency=float(os.getenv("FAKE_CHAT_LATENCY", "0.05")),
+        token_latency=float(os.getenv("FAKE_TOKEN_LATENCY", "0.0")),
+        embed_latency=float(os.getenv("FAKE_EMBED_LATENCY", "0.0")),
+        sufficient_rate=float(os.getenv("FAKE_SUFFICIENT_RATE", "0.5")),
+    )
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,129 @@
+"""
+Thread-safe pool of keep-alive HTTP(S) connections to a single Ollama host.
+
+urllib.request opens a new TCP (and TLS) connection for every request. This
+pool keeps up to `maxsize` connections open and reuses them, using only the
+standard library so the example keeps its minimal dependency footprint.
+"""
+
+import http.client
+import json
+import queue
+import ssl
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# Errors of a reused keep-alive connection that the server closed while it was
+# idle: the server hung up without sending a single byte of a response. Only
+# these are retried (once, on a new connection); timeouts and every other
+# failure are left to the caller's retry policy.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+class OllamaHTTPError(Exception):
+    """Raised when Ollama answers with an HTTP error status."""
+
+    def __init__(self, status: int, reason: str, body: str):
+        super().__init__(f"HTTP {status} {reason}: {body[:200]}")
+        self.status = status
+
+
+class HTTPConnectionPool:
+    """Keep-alive connections to one base URL, shared by all threads."""
+
+    def __init__(self, base_url: str, headers: dict, maxsize: int = 8,
+                 timeout: float | None = 300.0):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.headers = dict(headers)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(maxsize)
+        self._ssl_context = ssl.create_default_context() if self.scheme == "https" else None
+
+    def _new_connection(self):
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.timeout, context=self._ssl_context
+            )
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _checkout(self):
+        """Return (connection, whether it is a reused keep-alive connection)."""
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    @contextmanager
+    def request(self, method: str, path: str, payload=None, timeout: float | None = None):
+        """
+        Send a request and yield the http.client.HTTPResponse.
+
+        The connection goes back to the pool if the response was read to the
+        end, and is closed otherwise. A reused connection that turns out to
+        have been closed by the server is replaced by a new one; every other
+        error is raised. `timeout` overrides the pool's socket timeout for this
+        request.
+        """
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        self._slots.acquire()
+        conn = None
+        try:
+            conn, reused = self._checkout()
+            while True:
+                conn.timeout = self.timeout if timeout is None else timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(conn.timeout)
+                try:
+                    conn.request(method, path, body=body, headers=self.headers)
+                    response = conn.getresponse()
+                    break
+                except STALE_CONNECTION_ERRORS:
+                    conn.close()
+                    if not reused:
+                        conn = None
+                        raise
+                    conn, reused = self._new_connection(), False
+            if response.status >= 400:
+                raise OllamaHTTPError(response.status, response.reason,
+                                      response.read().decode("utf-8", "replace"))
+            yield response
+            if response.isclosed() and not response.will_close:
+                self._idle.put(conn)
+                conn = None
+        finally:
+            if conn is not None:
+                conn.close()
+            self._slots.release()
+
+    def post_json(self, path: str, payload: dict, timeout: float | None = None) -> dict:
+        """POST a JSON payload and return the decoded JSON response."""
+        with self.request("POST", path, payload, timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def post_lines(self, path: str, payload: dict, timeout: float | None = None):
+        """POST a JSON payload and yield the decoded objects of a newline-delimited JSON stream."""
+        with self.request("POST", path, payload, timeout) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line.decode("utf-8"))
+
+    def get_json(self, path: str) -> dict:
+        with self.request("GET", path) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
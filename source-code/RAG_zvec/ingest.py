@@ -0,0 +1,475 @@
+"""
+Pipelined ingestion engine for the RAG index.
+
+Three stages run concurrently and are connected by bounded queues, so a slow
+stage applies back-pressure instead of letting work pile up in memory:
+
+  1. parse  - a process pool stats, hashes, reads and chunks files, sending
+              the chunks of each file back in bounded batches
+  2. embed  - worker threads embed batches of chunks
+  3. write  - one writer thread inserts the embedded chunks into the index
+
+Each stage keeps throughput counters, and failures are collected per file
+instead of being silently dropped. Optionally, chunks that are near-duplicates
+of an already indexed chunk (MinHash/LSH) are skipped before embedding.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from chunker import iter_file_chunks
+from minhash import minhash_signature
+
+
+def file_sha256(path):
+    """Content hash of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Queue the parse workers send their messages to; set in each worker process
+_parse_results = None
+
+
+def _init_parse_worker(results):
+    global _parse_results
+    _parse_results = results
+
+
+def _send_chunks(rel, chunks, num_perm, start):
+    message = {"rel": rel, "status": "chunks", "chunks": chunks}
+    if num_perm:
+        message["signatures"] = [minhash_signature(text, num_perm) for text in chunks]
+    message["seconds"] = time.perf_counter() - start
+    _parse_results.put(message)
+
+
+def parse_file(rel, path, previous, chunk_tokens, overlap_tokens, num_perm=0, batch_size=256):
+    """
+    Parse-stage worker (runs in a child process): decide whether a file changed
+    since `previous` (its manifest entry, or None) and chunk it if it did.
+
+    Results go to the worker's bounded queue, so no file is ever held whole:
+    a changed file is streamed as "chunks" messages of at most `batch_size`
+    chunks (with their MinHash signatures when num_perm > 0), and every file
+    ends with one message of its status: "unchanged", "touched" or "changed"
+    (with the new manifest entry), or "error". While the queue is full the
+    worker waits, which applies back-pressure inside a file too.
+    """
+    start = time.perf_counter()
+    result = {"rel": rel}
+    try:
+        stat = os.stat(path)
+        entry = {"mtime": stat.st_mtime, "size": stat.st_size}
+        if previous and previous["mtime"] == stat.st_mtime and previous["size"] == stat.st_size:
+            result["status"] = "unchanged"
+            return
+        entry["sha256"] = file_sha256(path)
+        if previous and previous["sha256"] == entry["sha256"]:
+            result.update(status="touched", entry=dict(previous, **entry))
+            return
+        batch = []
+        for _, _, text in iter_file_chunks(path, chunk_tokens, overlap_tokens):
+            batch.append(text)
+            if len(batch) == batch_size:
+                _send_chunks(rel, batch, num_perm, start)
+                batch, start = [], time.perf_counter()
+        if batch:
+            _send_chunks(rel, batch, num_perm, start)
+            start = time.perf_counter()
+        result.update(status="changed", entry=entry)
+    except Exception as e:  # noqa: BLE001 - reported per file by the pipeline
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    finally:
+        result["seconds"] = time.perf_counter() - start
+        _parse_results.put(result)
+
+
+def _run_callback(fn, *args):
+    """
+    Call one of the pipeline's callbacks (embedding, writing, file hooks) and
+    return (result, None), or (None, error message) if it raised. They are
+    supplied by the application, so whatever they raise fails the files
+    involved rather than the worker thread that would stall the pipeline.
+    """
+    try:
+        return fn(*args), None
+    except Exception as e:  # noqa: BLE001
+        return None, f"{type(e).__name__}: {e}"
+
+
+class StageStats:
+    """Item counter and busy time of one pipeline stage."""
+
+    def __init__(self, name, unit):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items, seconds):
+        with self._lock:
+            self.items += items
+            self.seconds += seconds
+
+    def __str__(self):
+        rate = self.items / self.seconds if self.seconds > 0 else 0.0
+        return (f"{self.name:<6} {self.items:>8} {self.unit:<7} "
+                f"{self.seconds:8.2f}s busy  {rate:10.1f} {self.unit}/s per worker")
+
+
+class IngestReport:
+    """Outcome of one pipeline run."""
+
+    def __init__(self):
+        self.parse = StageStats("parse", "chunks")
+        self.embed = StageStats("embed", "chunks")
+        self.write = StageStats("write", "chunks")
+        self.files = {"changed": 0, "touched": 0, "unchanged": 0}
+        self.duplicates = 0  # chunks skipped as near-duplicates
+        self.errors = {}  # relative path -> error message
+        self.elapsed = 0.0
+
+    @property
+    def chunks(self):
+        return self.write.items
+
+    def summary(self):
+        rate = self.chunks / self.elapsed if self.elapsed > 0 else 0.0
+        lines = [
+            (f"Ingested {self.chunks} chunks from {self.files['changed']} new or changed file(s) "
+             f"in {self.elapsed:.1f}s ({rate:.1f} chunks/sec); "
+             f"{self.files['unchanged'] + self.files['touched']} unchanged, {len(self.errors)} failed"),
+            f"  {self.parse}",
+            f"  {self.embed}",
+            f"  {self.write}",
+        ]
+        if self.duplicates:
+            lines.append(f"  skipped {self.duplicates} near-duplicate chunk(s) of {self.parse.items} parsed")
+        if self.errors:
+            lines.append(f"  {len(self.errors)} file(s) could not be indexed:")
+            lines.extend(f"    {rel}: {error}" for rel, error in sorted(self.errors.items()))
+        return "\n".join(lines)
+
+
+class IngestPipeline:
+    """
+    Parse -> embed -> write pipeline.
+
+    embed_fn(texts) returns one vector per text and raises on failure.
+    write_fn(items) stores a list of (doc_id, text, vector) tuples.
+    on_file_done(rel, entry) is called once all chunks of a file are written,
+    with the file's new manifest entry (mtime, size, sha256, chunk_ids, and
+    with the near-duplicate filter duplicate_of: the ids of the indexed chunks
+    its skipped chunks duplicate, each with dedup.fingerprint() at that time).
+    on_file_failed(rel, written_ids) is called when a new or changed file fails,
+    with the ids of the chunks written or being written (possibly none), so
+    the caller can remove them together with the file's previous version.
+    doc_id_fn(rel, i) names chunk i of a file.
+    checkpoint_fn(in_progress) persists the index state; it is called after
+    every `checkpoint_every` written chunks and once when the run ends (also
+    when it is interrupted). `in_progress` maps each file whose chunks are only
+    partly written to its planned chunk ids, so a resumed run can clean them up.
+    dedup, a MinHashLSH over the signatures of the indexed chunks, enables the
+    near-duplicate filter: chunks with a near-duplicate in it are not embedded,
+    and the signatures of kept chunks are added to it. Once a chunk listed in
+    duplicate_of is deleted or rewritten, the caller must ingest that file
+    again to index the content it skipped.
+
+    Parse workers send chunks in batches of at most `parse_batch_size`, and
+    the writer buffers embedded chunks and calls write_fn with at most
+    `insert_batch_size` items, so memory stays bounded by the queue sizes and
+    these batches no matter how large the corpus or any single file is.
+    """
+
+    def __init__(self, embed_fn, write_fn, on_file_done, on_file_failed, doc_id_fn,
+                 checkpoint_fn=None, *, chunk_tokens=128, overlap_tokens=12, batch_size=32,
+                 embed_workers=2, parse_workers=None, queue_size=None,
+                 insert_batch_size=256, checkpoint_every=2048, dedup=None, parse_batch_size=256):
+        self.embed_fn = embed_fn
+        self.write_fn = write_fn
+        self.on_file_done = on_file_done
+        self.on_file_failed = on_file_failed
+        self.doc_id_fn = doc_id_fn
+        self.checkpoint_fn = checkpoint_fn
+        self.insert_batch_size = insert_batch_size
+        self.parse_batch_size = parse_batch_size
+        self.checkpoint_every = checkpoint_every
+        self.dedup = dedup
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.batch_size = batch_size
+        self.embed_workers = embed_workers
+        self.parse_workers = parse_workers or min(4, os.cpu_count() or 1)
+        self.queue_size = queue_size or 2 * embed_workers
+
+    def run(self, tasks, report=None):
+        """
+        Ingest `tasks`, a list of (relative path, file path, previous manifest
+        entry or None) tuples, and return an IngestReport (`report`, added to,
+        if given).
+        """
+        report = report if report is not None else IngestReport()
+        start = time.perf_counter()
+        embed_queue = queue.Queue(maxsize=self.queue_size)
+        write_queue = queue.Queue(maxsize=self.queue_size)
+        lock = threading.Lock()        # guards the bookkeeping below
+        index_lock = threading.Lock()  # serializes all callbacks that modify the index
+        remaining = {}  # rel -> chunks not yet written
+        entries = {}    # rel -> manifest entry being built
+        written = {}    # rel -> doc ids already written
+        parsing = {}    # rel -> index of its next chunk, while chunks are still arriving
+
+        def fail(rels, error):
+            for rel in rels:
+                with lock:
+                    if rel in report.errors or rel not in remaining:
+                        continue
+                    report.errors[rel] = error
+                    del remaining[rel]
+                    parsing.pop(rel, None)
+                    ids = written.pop(rel, [])
+                    planned = entries.pop(rel)["chunk_ids"]
+                if self.dedup is not None:
+                    for doc_id in planned:
+                        self.dedup.remove(doc_id)
+                with index_lock:
+                    _, error = _run_callback(self.on_file_failed, rel, ids)
+                if error is not None:
+                    with lock:
+                        report.errors[rel] += f"; cleanup failed: {error}"
+
+        def file_done(rel, entry):
+            with index_lock:
+                _, error = _run_callback(self.on_file_done, rel, entry)
+            if error is not None:
+                with lock:
+                    report.errors[rel] = f"finishing failed: {error}"
+
+        def embedder():
+            while (batch := embed_queue.get()) is not None:
+                t0 = time.perf_counter()
+                vectors, error = _run_callback(self.embed_fn, [text for _, _, text in batch])
+                if error is not None:
+                    fail({rel for rel, _, _ in batch}, f"embedding failed: {error}")
+                    continue
+                report.embed.add(len(batch), time.perf_counter() - t0)
+                write_queue.put([item + (vector,) for item, vector in zip(batch, vectors)])
+
+        def checkpoint():
+            if self.checkpoint_fn is None:
+                return
+            with lock:
+                in_progress = {rel: list(entries[rel]["chunk_ids"]) for rel in remaining}
+            with index_lock:
+                self.checkpoint_fn(in_progress)
+
+        def write(batch):
+            t0 = time.perf_counter()
+            with index_lock:
+                # Record the ids before writing them: if an embedder fails the file
+                # meanwhile, its cleanup waits for index_lock and so deletes this batch too
+                with lock:
+                    batch = [item for item in batch if item[0] in remaining]
+                    for rel, doc_id, _, _ in batch:
+                        written.setdefault(rel, []).append(doc_id)
+                if not batch:
+                    return
+                _, error = _run_callback(self.write_fn, [(doc_id, text, vector) for _, doc_id, text, vector in batch])
+            if error is not None:
+                fail({rel for rel, _, _, _ in batch}, f"write failed: {error}")
+                return
+            report.write.add(len(batch), time.perf_counter() - t0)
+            done = []
+            with lock:
+                for rel, _, _, _ in batch:
+                    if rel not in remaining:
+                        continue
+                    remaining[rel] -= 1
+                    if remaining[rel] == 0 and rel not in parsing:
+                        del remaining[rel]
+                        written.pop(rel, None)
+                        done.append(rel)
+            for rel in done:
+                file_done(rel, entries.pop(rel))
+
+        def writer():
+            buffer = []
+            since_checkpoint = 0
+            while (batch := write_queue.get()) is not None:
+                buffer.extend(batch)
+                while len(buffer) >= self.insert_batch_size:
+                    write(buffer[:self.insert_batch_size])
+                    del buffer[:self.insert_batch_size]
+                    since_checkpoint += self.insert_batch_size
+                if since_checkpoint >= self.checkpoint_every:
+                    checkpoint()
+                    since_checkpoint = 0
+            write(buffer)
+
+        embedders = [threading.Thread(target=embedder, daemon=True) for _ in range(self.embed_workers)]
+        write_thread = threading.Thread(target=writer, daemon=True)
+        for thread in embedders + [write_thread]:
+            thread.start()
+
+        previous_entries = {rel: previous for rel, _, previous in tasks}
+        started = set()  # changed files whose chunks started arriving
+        batch = []
+        interrupted = True
+        try:
+            for message in self._parse_all(tasks):
+                rel, status = message["rel"], message["status"]
+                if status == "chunks":
+                    chunks = message["chunks"]
+                    report.parse.add(len(chunks), message["seconds"])
+                    if rel not in started:
+                        started.add(rel)
+                        if self.dedup is not None and previous_entries.get(rel):
+                            # The old version is being replaced, so it must not count as a duplicate
+                            for doc_id in previous_entries[rel]["chunk_ids"]:
+                                self.dedup.remove(doc_id)
+                        with lock:
+                            remaining[rel] = 0
+                            entries[rel] = {"chunk_ids": []}
+                            if self.dedup is not None:
+                                entries[rel]["duplicate_of"] = {}
+                            parsing[rel] = 0
+                    with lock:
+                        if rel not in parsing:  # the file already failed
+                            continue
+                        first = parsing[rel]
+                        parsing[rel] += len(chunks)
+                    kept, originals = self._drop_duplicates(rel, first, chunks, message.get("signatures"), report)
+                    with lock:
+                        remaining[rel] += len(kept)
+                        entries[rel]["chunk_ids"].extend(doc_id for doc_id, _ in kept)
+                        if originals:
+                            entries[rel]["duplicate_of"].update(originals)
+                    for doc_id, text in kept:
+                        batch.append((rel, doc_id, text))
+                        if len(batch) == self.batch_size:
+                            embed_queue.put(batch)
+                            batch = []
+                    continue
+                if status == "error":
+                    if rel in started:
+                        fail([rel], message["error"])
+                    else:
+                        report.errors[rel] = message["error"]
+                    continue
+                report.files[status] += 1
+                if status == "touched":
+                    file_done(rel, message["entry"])
+                if status != "changed":
+                    continue
+                if rel not in started:  # no chunks at all
+                    file_done(rel, dict(message["entry"], chunk_ids=[]))
+                    continue
+                with lock:
+                    if parsing.pop(rel, None) is None:  # the file already failed
+                        continue
+                    entries[rel].update(message["entry"])
+                    finished = remaining[rel] == 0
+                    if finished:
+                        del remaining[rel]
+                        written.pop(rel, None)
+                        entry = entries.pop(rel)
+                if finished:
+                    file_done(rel, entry)
+            if batch:
+                embed_queue.put(batch)
+            interrupted = False
+        finally:
+            for _ in embedders:
+                embed_queue.put(None)
+            for thread in embedders:
+                thread.join()
+            write_queue.put(None)
+            write_thread.join()
+            if interrupted:
+                # Persist everything written so far; the next run resumes from here
+                checkpoint()
+
+        for rel in list(remaining):
+            fail([rel], "chunks were not written")
+        checkpoint()
+        report.elapsed += time.perf_counter() - start
+        return report
+
+    def _drop_duplicates(self, rel, first, chunks, signatures, report):
+        """
+        Split a batch of a file's chunks, numbered from `first`, into the
+        (doc id, text) of those that are not near-duplicates of indexed chunks
+        and {id: fingerprint} of the indexed chunks the others duplicate.
+        """
+        if self.dedup is None:
+            return [(self.doc_id_fn(rel, i), text) for i, text in enumerate(chunks, start=first)], {}
+        kept = []
+        originals = {}
+        for i, (text, signature) in enumerate(zip(chunks, signatures), start=first):
+            original = self.dedup.find(signature)
+            if original is not None:
+                report.duplicates += 1
+                originals[original] = self.dedup.fingerprint(original)
+                continue
+            doc_id = self.doc_id_fn(rel, i)
+            self.dedup.add(doc_id, signature)
+            kept.append((doc_id, text))
+        return kept, originals
+
+    def _parse_all(self, tasks):
+        """
+        Yield the parse workers' messages (see parse_file), keeping at most
+        2 * parse_workers files in flight and as many messages queued.
+        """
+        results = multiprocessing.Queue(maxsize=2 * self.parse_workers)
+        pool = ProcessPoolExecutor(max_workers=self.parse_workers,
+                                   initializer=_init_parse_worker, initargs=(results,))
+        tasks = iter(tasks)
+        in_flight = {}  # rel -> future, until the file's final message arrived
+        try:
+            while True:
+                while len(in_flight) < 2 * self.parse_workers:
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    rel, path, previous = task
+                    in_flight[rel] = pool.submit(parse_file, rel, str(path), previous,
+                                                 self.chunk_tokens, self.overlap_tokens,
+                                                 self.dedup.num_perm if self.dedup is not None else 0,
+                                                 self.parse_batch_size)
+                if not in_flight:
+                    return
+                try:
+                    message = results.get(timeout=1.0)
+                except queue.Empty:
+                    # A worker process that died never sends its final message
+                    for rel, future in list(in_flight.items()):
+                        if future.done() and future.exception() is not None:
+                            del in_flight[rel]
+                            error = future.exception()
+                            yield {"rel": rel, "status": "error", "error": f"{type(error).__name__}: {error}"}
+                    continue
+                if message["status"] != "chunks":
+                    in_flight.pop(message["rel"], None)
+                yield message
+        finally:
+            # When the run is interrupted, workers blocked on the full queue must still finish
+            for future in in_flight.values():
+                future.cancel()
+            while not all(future.done() for future in in_flight.values()):
+                try:
+                    results.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            pool.shutdown()
+            results.close()
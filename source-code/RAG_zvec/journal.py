@@ -0,0 +1,96 @@
+"""
+Append-only change logs for the manifest and side indexes (BM25, MinHash) of
+the RAG index.
+
+Rewriting the whole manifest and side indexes at every ingestion checkpoint
+costs time in proportion to the index, so checkpointing a large corpus every
+few thousand chunks adds up to quadratic work. Instead each of them is stored
+as a JSON snapshot plus a log of the changes made since (one JSON line per
+change). A checkpoint only appends the changes made since the last one. Once the log has
+grown to half the size of the snapshot, the snapshot is rewritten and the log
+started afresh, so the bytes written stay proportional to the changes made.
+
+Each snapshot names its own log (`<snapshot>.<id>.log`, the id is stored in
+the snapshot), so a crash between writing a new snapshot and deleting the old
+log cannot replay stale changes onto the new snapshot.
+"""
+
+import glob
+import json
+import os
+import uuid
+
+
+def log_path(path: str, log_id: str) -> str:
+    return f"{path}.{log_id}.log"
+
+
+def read_log(path: str, log_id: str | None) -> list:
+    """Changes logged since the snapshot at `path`, oldest first."""
+    changes = []
+    if not log_id:
+        return changes
+    try:
+        with open(log_path(path, log_id), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    changes.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break  # torn last line of an interrupted append
+    except FileNotFoundError:
+        pass
+    return changes
+
+
+class ChangeLog:
+    """Changes of one index not yet written, and the snapshot they belong to."""
+
+    def __init__(self):
+        self.pending = []   # changes made since the last write, as JSON-serializable lists
+        self.path = None    # snapshot this index was last saved to or loaded from
+        self.log_id = None  # id of that snapshot's log
+
+    def record(self, *change):
+        self.pending.append(list(change))
+
+    def take(self) -> list:
+        """Return the pending changes and start a new list (call under the index's lock)."""
+        changes, self.pending = self.pending, []
+        return changes
+
+    @staticmethod
+    def new_id() -> str:
+        """Log id to store in a snapshot about to be written."""
+        return uuid.uuid4().hex
+
+    def attach(self, path: str, log_id: str | None):
+        """The index was loaded from the snapshot at `path` and its log."""
+        self.path = path
+        self.log_id = log_id
+
+    def saved(self, path: str, log_id: str):
+        """A full snapshot naming `log_id` was written to `path`; older logs are obsolete."""
+        self.path = path
+        self.log_id = log_id
+        for old in glob.glob(glob.escape(path) + ".*.log"):
+            if old != log_path(path, log_id):
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+
+    def persist(self, path: str, changes: list, save):
+        """
+        Write `changes` (from take()) for the snapshot at `path`: appended to
+        its log, or by calling save(path) to write a new snapshot when the index
+        has none at `path` yet or the log outgrew half the snapshot.
+        """
+        if self.path != path or not self.log_id or not os.path.exists(path):
+            save(path)
+            return
+        log = log_path(path, self.log_id)
+        if changes:
+            with open(log, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(change) + "\n" for change in changes)
+        if os.path.exists(log) and os.path.getsize(log) > os.path.getsize(path) / 2:
+            save(path)
@@ -0,0 +1,179 @@
+"""
+MinHash signatures and LSH banding for near-duplicate text detection.
+
+Overlapping chunks and boilerplate repeated across files produce chunks that
+are almost, but not exactly, identical. A MinHash signature summarizes the set
+of word 3-grams of a text so that the fraction of equal signature positions
+estimates the Jaccard similarity of two texts. Locality-sensitive hashing
+splits signatures into bands, so finding the near-duplicates of a chunk only
+compares it with the few chunks that share a band instead of all of them.
+"""
+
+import json
+import os
+import random
+import threading
+import zlib
+from array import array
+
+from journal import ChangeLog, read_log
+
+PRIME = 4294967291  # largest prime below 2**32, so hash values fit in 32 bits
+SHINGLE_WORDS = 3
+NUM_PERM = 64
+
+_permutations = {}
+
+
+def _hash_functions(num_perm: int) -> list:
+    """(a, b) pairs of the universal hash functions (a * x + b) mod PRIME, fixed by a seed."""
+    if num_perm not in _permutations:
+        rng = random.Random(num_perm)
+        _permutations[num_perm] = [(rng.randrange(1, PRIME), rng.randrange(0, PRIME)) for _ in range(num_perm)]
+    return _permutations[num_perm]
+
+
+def shingles(text: str, words: int = SHINGLE_WORDS) -> set:
+    """Set of overlapping lowercased word n-grams of `text`."""
+    tokens = text.lower().split()
+    if len(tokens) <= words:
+        return {" ".join(tokens)}
+    return {" ".join(tokens[i:i + words]) for i in range(len(tokens) - words + 1)}
+
+
+def minhash_signature(text: str, num_perm: int = NUM_PERM) -> array:
+    """MinHash signature of the word 3-grams of `text` as an array of 32-bit ints."""
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text)]
+    return array("I", [min((a * h + b) % PRIME for h in hashes) for a, b in _hash_functions(num_perm)])
+
+
+def estimated_similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def lsh_bands(num_perm: int, threshold: float) -> tuple:
+    """
+    Choose (bands, rows per band) for a similarity threshold. Two texts become
+    candidates with probability 1 - (1 - s**rows)**bands, which rises steeply
+    around (1 / bands) ** (1 / rows); pick the largest such point not above
+    the threshold so near-duplicates are rarely missed.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+class MinHashLSH:
+    """Thread-safe index of MinHash signatures answering "is there a near-duplicate of this?"."""
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = NUM_PERM):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        self.signatures = {}  # key -> signature
+        self._buckets = [{} for _ in range(self.bands)]  # per band: band bytes -> set of keys
+        self._lock = threading.Lock()
+        self._log = ChangeLog()
+
+    def fingerprint(self, key):
+        """Short hash of the signature stored under `key`, or None if there is none."""
+        with self._lock:
+            signature = self.signatures.get(key)
+        return None if signature is None else f"{zlib.crc32(signature.tobytes()):08x}"
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [signature[i * rows:(i + 1) * rows].tobytes() for i in range(self.bands)]
+
+    def find(self, signature):
+        """Return the key of the most similar entry at or above the threshold, or None."""
+        with self._lock:
+            candidates = set()
+            for bucket, band in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(bucket.get(band, ()))
+            best, best_similarity = None, self.threshold
+            for key in candidates:
+                similarity = estimated_similarity(signature, self.signatures[key])
+                if similarity >= best_similarity:
+                    best, best_similarity = key, similarity
+            return best
+
+    def add(self, key, signature):
+        with self._lock:
+            self._add(key, signature)
+            self._log.record("add", key, signature.tobytes().hex())
+
+    def _add(self, key, signature):
+        self._remove(key)
+        self.signatures[key] = signature
+        for bucket, band in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(band, set()).add(key)
+
+    def remove(self, key):
+        with self._lock:
+            if key in self.signatures:
+                self._remove(key)
+                self._log.record("remove", key)
+
+    def _remove(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for bucket, band in zip(self._buckets, self._band_keys(signature)):
+            keys = bucket[band]
+            keys.discard(key)
+            if not keys:
+                del bucket[band]
+
+    def save(self, path: str):
+        """Write a full snapshot to `path` (and drop its change log)."""
+        with self._lock:
+            self._log.take()
+            log_id = ChangeLog.new_id()
+            data = {
+                "threshold": self.threshold,
+                "num_perm": self.num_perm,
+                "signatures": {key: sig.tobytes().hex() for key, sig in self.signatures.items()},
+                "log": log_id,
+            }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+        self._log.saved(path, log_id)
+
+    def save_changes(self, path: str):
+        """Persist the changes since the last save, usually by appending them to the change log."""
+        with self._lock:
+            changes = self._log.take()
+        self._log.persist(path, changes, self.save)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(data["threshold"], data["num_perm"])
+        for key, hex_signature in data["signatures"].items():
+            index._add(key, _decode(hex_signature))
+        for op, key, *signature in read_log(path, data.get("log")):
+            if op == "add":
+                index._add(key, _decode(signature[0]))
+            else:
+                index._remove(key)
+        index._log.attach(path, data.get("log"))
+        return index
+
+
+def _decode(hex_signature: str) -> array:
+    signature = array("I")
+    signature.frombytes(bytes.fromhex(hex_signature))
+    return signature
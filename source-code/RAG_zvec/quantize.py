@@ -0,0 +1,71 @@
+"""
+Quantized vector storage modes for the zvec index.
+
+A 768-dimensional float32 vector takes 3 KB per chunk. Storing it as float16
+halves that, and int8 with one float32 scale per vector (value = int * scale)
+brings it to about 0.8 KB. Quantized scores are approximate, so callers fetch
+more candidates than they need and re-score them, either with the int8 scale
+or exactly against the original float32 vectors.
+"""
+
+import math
+import operator
+from array import array
+
+STORAGE_MODES = ("fp32", "fp16", "int8")
+BYTES_PER_DIMENSION = {"fp32": 4, "fp16": 2, "int8": 1}
+
+# int8 covers +-INT8_RANGE_SIGMAS standard deviations of a vector's components
+INT8_RANGE_SIGMAS = 5.0
+
+
+def bytes_per_vector(storage: str, dimension: int) -> int:
+    """Stored size of one vector, including the int8 scale."""
+    return dimension * BYTES_PER_DIMENSION[storage] + (4 if storage == "int8" else 0)
+
+
+def quantize_int8(vector) -> tuple:
+    """
+    Symmetric int8 quantization: (list of ints in [-127, 127], scale).
+
+    The scale follows the vector's norm rather than its largest component, so
+    normalized embeddings all share one scale and zvec's integer inner
+    products rank them like the float vectors would. (With a max-abs scale
+    every vector is scaled differently and the integer ranking is badly off.)
+    Components beyond INT8_RANGE_SIGMAS standard deviations are clipped.
+    """
+    norm = math.sqrt(sum(x * x for x in vector))
+    if not norm:
+        return [0] * len(vector), 1.0
+    scale = norm * INT8_RANGE_SIGMAS / math.sqrt(len(vector)) / 127
+    return [max(-127, min(127, round(x / scale))) for x in vector], scale
+
+
+def encode_vector(vector, storage: str) -> tuple:
+    """(vector to store, per-vector scale) for a float32 embedding."""
+    if storage == "int8":
+        return quantize_int8(vector)
+    return vector, 1.0  # zvec converts float input to float16 itself
+
+
+def encode_query(vector, storage: str):
+    """
+    Query vector in the stored type. An int8 index only accepts int8 queries;
+    the query's own scale is dropped because it does not change the ranking.
+    """
+    if storage == "int8":
+        return quantize_int8(vector)[0]
+    return vector
+
+
+def decode_vector(stored, scale: float, storage: str) -> array:
+    """Approximate float32 vector back from its stored form."""
+    if storage == "int8":
+        return array("f", [value * scale for value in stored])
+    return array("f", stored)
+
+
+def dot(a, b) -> float:
+    if hasattr(math, "sumprod"):  # Python 3.12+: the products are summed in C
+        return math.sumprod(a, b)
+    return sum(map(operator.mul, a, b))
@@ -0,0 +1,259 @@
+"""
+HTTP server mode for the agentic RAG pipeline (asyncio, standard library only).
+
+The index is built once at startup and shared by all requests. Questions run
+in worker threads, at most SERVER_CONCURRENCY at a time; further questions
+wait, and once SERVER_MAX_PENDING are waiting new ones get 503. Requests to
+Ollama are additionally bounded by the connection pool (OLLAMA_POOL_SIZE).
+
+Endpoints:
+
+    GET  /health                      -> {"status": "ok", "index_version": ...}
+    POST /search {"query", "topk"?, "mode"?}
+                                      -> {"query": ..., "results": [chunk text, ...]}
+    POST /ask    {"question", "stream"?}
+                                      -> {"answer": ...}, or with "stream": true a
+                                         text/event-stream of "token" events and a
+                                         final "done" event
+
+Run with:  uv run server.py
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import app
+
+HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+PORT = int(os.getenv("SERVER_PORT", "8000"))
+CONCURRENCY = int(os.getenv("SERVER_CONCURRENCY", "4"))
+MAX_PENDING = int(os.getenv("SERVER_MAX_PENDING", "64"))
+MAX_BODY_BYTES = 1 << 20
+MAX_TOPK = 100
+MAX_HEADERS = 100  # per request; each line is limited to 64 KiB by asyncio's stream reader
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class RAGServer:
+    """Serves one shared collection over HTTP."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.executor = ThreadPoolExecutor(max_workers=CONCURRENCY + app.config["search_workers"])
+        self.slots = asyncio.Semaphore(CONCURRENCY)
+        self.pending = 0
+
+    async def run_blocking(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    # ---- HTTP plumbing --------------------------------------------------
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    keep_alive = await self.dispatch(method, path, body, writer) and keep_alive
+                except HTTPError as e:
+                    await self.send_json(writer, e.status, {"error": str(e)})
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:  # noqa: BLE001 - any other failure is answered with a 500
+                    print(f"Error handling {method} {path}: {type(e).__name__}: {e}")
+                    await self.send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"}, keep_alive=False)
+                    break
+                if not keep_alive:
+                    break
+        except HTTPError as e:
+            await self.send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_line(self, reader) -> bytes:
+        try:
+            return await reader.readline()
+        except ValueError:  # longer than the stream reader's limit
+            raise HTTPError(400, "request line or header too long")
+
+    async def read_request(self, reader):
+        """Return (method, path, headers, body) or None when the client closed the connection."""
+        line = await self.read_line(reader)
+        if not line.strip():
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+        headers = {}
+        lines = 0
+        while (line := await self.read_line(reader)) not in (b"\r\n", b"\n", b""):
+            lines += 1
+            if lines > MAX_HEADERS:
+                raise HTTPError(400, "too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "Content-Length must be a number")
+        if length < 0:
+            raise HTTPError(400, "Content-Length must not be negative")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), urlsplit(target).path, headers, body
+
+    async def send_json(self, writer, status: int, payload: dict, keep_alive: bool = True):
+        data = json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+        )
+        await writer.drain()
+
+    async def dispatch(self, method: str, path: str, body: bytes, writer) -> bool:
+        """Handle one request; returns whether the connection may be reused."""
+        routes = {"/health": ("GET", self.health), "/search": ("POST", self.search), "/ask": ("POST", self.ask)}
+        if path not in routes:
+            raise HTTPError(404, f"no endpoint {path}")
+        expected, handler = routes[path]
+        if method != expected:
+            raise HTTPError(405, f"use {expected} for {path}")
+        try:
+            payload = json.loads(body) if body else {}
+        except json.JSONDecodeError:
+            raise HTTPError(400, "request body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "request body must be a JSON object")
+        return await handler(payload, writer)
+
+    # ---- endpoints ------------------------------------------------------
+
+    async def health(self, payload, writer):
+        await self.send_json(writer, 200, {
+            "status": "ok",
+            "index_version": app.index_versions.get(self.collection.path, ""),
+            "pending": self.pending,
+        })
+        return True
+
+    async def search(self, payload, writer):
+        query = payload.get("query")
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(400, "'query' must be a non-empty string")
+        topk = payload.get("topk", 5)
+        if not isinstance(topk, int) or isinstance(topk, bool) or not 1 <= topk <= MAX_TOPK:
+            raise HTTPError(400, f"'topk' must be an integer from 1 to {MAX_TOPK}")
+        mode = payload.get("mode") or app.config["retrieval_mode"]
+        if mode not in ("vector", "bm25", "hybrid"):
+            raise HTTPError(400, "'mode' must be vector, bm25 or hybrid")
+
+        def run():
+            vector = None if mode == "bm25" else app.get_embedding(query)
+            # Fall back to keyword search when the query could not be embedded
+            return app.retrieve(self.collection, query, vector, topk=topk, mode="bm25" if vector is None else mode)
+
+        results = await self.run_blocking(run)
+        await self.send_json(writer, 200, {"query": query, "results": results})
+        return True
+
+    async def ask(self, payload, writer):
+        question = payload.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise HTTPError(400, "'question' must be a non-empty string")
+        stream = bool(payload.get("stream", False))
+        if self.pending >= MAX_PENDING:
+            raise HTTPError(503, "too many questions in progress, retry later")
+        self.pending += 1
+        try:
+            async with self.slots:
+                answer = await self.run_blocking(app.answer_question, self.collection, question, stream)
+                if not stream:
+                    await self.send_json(writer, 200, {"answer": answer})
+                    return True
+                await self.stream_answer(answer, writer)
+                return False
+        finally:
+            self.pending -= 1
+
+    async def stream_answer(self, answer, writer):
+        """Send the answer as server-sent events: one "token" event per token, then "done"."""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        await writer.drain()
+        if not isinstance(answer, app.TokenStream):
+            # Cached or speculative answers are already complete
+            await self.send_event(writer, "token", answer)
+            await self.send_event(writer, "done", {"answer": answer})
+            return
+
+        loop = asyncio.get_running_loop()
+        tokens = asyncio.Queue()
+        cancelled = False
+
+        def produce():
+            # Runs in a worker thread; stops reading from Ollama if the client went away
+            try:
+                for token in answer:
+                    if cancelled:
+                        break
+                    loop.call_soon_threadsafe(tokens.put_nowait, token)
+            finally:
+                loop.call_soon_threadsafe(tokens.put_nowait, None)
+
+        producer = loop.run_in_executor(self.executor, produce)
+        try:
+            while (token := await tokens.get()) is not None:
+                await self.send_event(writer, "token", token)
+            await self.send_event(writer, "done", {
+                "answer": answer.text, "ttft": answer.ttft, "elapsed": answer.elapsed,
+            })
+        except ConnectionError:
+            cancelled = True
+        finally:
+            await producer
+
+    async def send_event(self, writer, event: str, data):
+        writer.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+        await writer.drain()
+
+
+async def serve():
+    app.get_residency()  # starts preloading OLLAMA_RESIDENT_MODELS while the index is built
+    print("Building zvec index from text files …")
+    collection = await asyncio.to_thread(app.build_index)
+    rag_server = RAGServer(collection)
+    server = await asyncio.start_server(rag_server.handle_connection, HOST, PORT)
+    print(f"\nAgentic RAG server listening on http://{HOST}:{PORT}  (model: {app.config['chat_model']})")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\nGoodbye!")
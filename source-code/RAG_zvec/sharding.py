@@ -0,0 +1,71 @@
+"""
+Sharded index: several independent zvec collections searched as one.
+
+Files are assigned to shards by their top-level directory under DATA_DIR or
+by a stable hash of their path. Every shard has its own collection, manifest,
+BM25 and near-duplicate index, so shards are built in parallel and one shard
+can be rebuilt without touching the others. Queries fan out to all shards
+concurrently and the per-shard top-k lists are merged with a heap.
+"""
+
+import heapq
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+
+def shard_name(rel_path: str, shard_by: str, shards: int) -> str:
+    """Shard of a file: "dir_<top-level directory>" or "shard<i>" by hash of the path."""
+    if shard_by == "directory":
+        top = rel_path.split("/", 1)[0] if "/" in rel_path else "root"
+        return "dir_" + re.sub(r"[^A-Za-z0-9_.-]", "_", top)
+    return f"shard{zlib.crc32(rel_path.encode('utf-8')) % shards}"
+
+
+class ShardedCollection:
+    """
+    Read-only view over several zvec collections with the query and fetch
+    methods the retrieval code uses. `path` identifies the whole index.
+    """
+
+    def __init__(self, collections: dict, path: str):
+        self.shards = collections  # shard name -> zvec collection
+        self.path = path
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(collections)))
+
+    def _fan_out(self, fn):
+        return list(self._pool.map(fn, self.shards.values()))
+
+    def query(self, vector_query, topk=10, **kwargs):
+        """Query every shard concurrently and return the overall top-k docs by score."""
+        results = self._fan_out(lambda collection: collection.query(vector_query, topk=topk, **kwargs))
+        return heapq.nlargest(topk, (doc for docs in results for doc in docs), key=lambda doc: doc.score)
+
+    def fetch(self, ids):
+        """Fetch docs by id from whichever shards hold them."""
+        found = {}
+        for docs in self._fan_out(lambda collection: collection.fetch(ids)):
+            found.update(docs)
+        return found
+
+    @property
+    def stats(self):
+        return {name: collection.stats for name, collection in self.shards.items()}
+
+
+class ShardedBM25:
+    """
+    Searches the BM25 indexes of all shards and merges their top-k lists.
+    Each shard scores with its own term statistics, which ranks nearly like
+    a single index once shards hold more than a few hundred chunks.
+    """
+
+    def __init__(self, indexes: list):
+        self.indexes = indexes
+
+    def __len__(self):
+        return sum(len(index) for index in self.indexes)
+
+    def search(self, query: str, topk: int = 5) -> list:
+        hits = (hit for index in self.indexes for hit in index.search(query, topk))
+        return heapq.nlargest(topk, hits, key=lambda hit: hit[1])
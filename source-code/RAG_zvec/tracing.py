@@ -0,0 +1,206 @@
+"""
+Per-question traces of the agentic RAG loop.
+
+A Trace holds one span per agent stage run (planner, retrieval, sufficiency,
+rewriter, synthesis, ...) with its duration. While a stage runs, its span is
+the current span of that thread (a contextvar), so the Ollama calls made
+inside it add their token statistics to it without the trace being passed
+down. Finished traces are appended to a JSONL file, and `format_summary`
+turns a set of traces into p50/p95 latencies per stage:
+
+    python tracing.py traces.jsonl
+"""
+
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Token statistics Ollama reports for a chat call (durations in nanoseconds)
+OLLAMA_STATS = ("prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration")
+
+current_span = ContextVar("current_span", default=None)
+
+
+class Span:
+    """One run of an agent stage: start offset and duration (seconds), LLM calls and their token stats."""
+
+    def __init__(self, name: str, offset: float):
+        self.name = name
+        self.offset = offset  # seconds since the start of the trace
+        self.duration = None  # None while the stage is still running
+        self.llm_calls = 0
+        self.stats = dict.fromkeys(OLLAMA_STATS, 0)
+        self.attributes = {}
+
+    def add_llm_call(self, response: dict):
+        """Count one chat call and add the token stats of its (final) response."""
+        self.llm_calls += 1
+        for key in OLLAMA_STATS:
+            self.stats[key] += response.get(key) or 0
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "offset": round(self.offset, 4),
+            "duration": None if self.duration is None else round(self.duration, 4),
+            "llm_calls": self.llm_calls,
+            **self.stats,
+            **self.attributes,
+        }
+
+
+def record_llm_call(response: dict):
+    """Add a chat response's token stats to the current span, if any."""
+    span = current_span.get()
+    if span is not None:
+        span.add_llm_call(response)
+
+
+def annotate(**attributes):
+    """Attach extra fields (counts, sub-timings) to the current span, if any."""
+    span = current_span.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+class Trace:
+    """Spans of one question, in start order; stages may run in worker threads."""
+
+    def __init__(self, question: str = ""):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.question = question
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.attributes = {}
+        self._lock = threading.Lock()
+
+    def begin(self, name: str) -> Span:
+        """Start a span that is ended explicitly with end(), e.g. around a token stream."""
+        span = Span(name, time.perf_counter() - self.start)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def end(self, span: Span, response: dict | None = None):
+        """End a span started with begin(); `response` is the final chat response, if any."""
+        if response is not None:
+            span.add_llm_call(response)
+        span.duration = time.perf_counter() - self.start - span.offset
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as a span that is current in this thread meanwhile."""
+        span = self.begin(name)
+        token = current_span.set(span)
+        try:
+            yield span
+        finally:
+            current_span.reset(token)
+            self.end(span)
+
+    def run(self, name: str, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs) inside stage `name`."""
+        with self.stage(name):
+            return fn(*args, **kwargs)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+
+    def summary(self) -> str:
+        """Time per stage so far, and how much running stages in parallel saved."""
+        wall = time.perf_counter() - self.start
+        stages = {}
+        with self._lock:
+            for span in self.spans:
+                if span.duration is not None:
+                    stages[span.name] = stages.get(span.name, 0.0) + span.duration
+        busy = sum(stages.values())
+        parts = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in stages.items())
+        return (f"{parts} | sum of stages {busy:.2f}s, wall clock {wall:.2f}s, "
+                f"saved {max(0.0, busy - wall):.2f}s by overlapping")
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {
+            "trace_id": self.trace_id,
+            "started_at": round(self.started_at, 3),
+            "question": self.question,
+            "duration": None if self.duration is None else round(self.duration, 4),
+            **self.attributes,
+            "spans": spans,
+        }
+
+
+class TraceLog:
+    """
+    Collects finished traces: appends each one as a line to a JSONL file (if a
+    path is given) and keeps the most recent ones in memory for a summary.
+    """
+
+    def __init__(self, path: str = "", keep: int = 10000):
+        self.path = path
+        self.records = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace):
+        record = trace.to_dict()
+        with self._lock:
+            self.records.append(record)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))]
+
+
+def format_summary(records) -> str:
+    """Table of p50/p95 duration and mean token counts per stage over trace records."""
+    stages = {}  # stage name -> list of finished span dicts, in first-seen order
+    for record in records:
+        for span in record["spans"]:
+            if span.get("duration") is not None:
+                stages.setdefault(span["name"], []).append(span)
+    totals = [record["duration"] for record in records if record.get("duration") is not None]
+
+    lines = [(f"{'stage':<24} {'count':>6} {'p50 s':>8} {'p95 s':>8} {'llm calls':>10} "
+              f"{'prompt tok':>11} {'output tok':>11} {'output tok/s':>13}")]
+    for name, spans in stages.items():
+        durations = [span["duration"] for span in spans]
+        eval_seconds = sum(span.get("eval_duration", 0) for span in spans) / 1e9
+        eval_count = sum(span.get("eval_count", 0) for span in spans)
+        rate = f"{eval_count / eval_seconds:.1f}" if eval_seconds else "-"
+        lines.append(
+            f"{name:<24} {len(spans):>6} {percentile(durations, 50):>8.2f} {percentile(durations, 95):>8.2f} "
+            f"{sum(span.get('llm_calls', 0) for span in spans) / len(spans):>10.2f} "
+            f"{sum(span.get('prompt_eval_count', 0) for span in spans) / len(spans):>11.1f} "
+            f"{eval_count / len(spans):>11.1f} {rate:>13}"
+        )
+    if totals:
+        lines.append(f"{'whole question':<24} {len(totals):>6} {percentile(totals, 50):>8.2f} "
+                     f"{percentile(totals, 95):>8.2f}")
+    return "\n".join(lines)
+
+
+def load_traces(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python tracing.py TRACE_FILE.jsonl")
+    records = load_traces(sys.argv[1])
+    print(f"{len(records)} trace(s) in {sys.argv[1]}\n")
+    print(format_summary(records))
@@ -1,6 +1,10 @@
 """
 Benchmark local Ollama models by measuring wall-clock inference time and
 inference time per output token on two standard prompts.
+
+Each model is explicitly loaded before it is measured (reporting the cold
+load time) and unloaded afterwards, so the next model does not compete with
+it for memory.
 """
 
 import sys
@@ -13,6 +17,8 @@ if str(ROOT) not in sys.path:
 
 from ollama import Client
 
+from ollama_config import ResidencyManager
+
 MODELS = ["qwen3.5:2b", "gemma4:e2b-mlx"]
 
 WARMUP_PROMPT = (
@@ -23,12 +29,17 @@ PROMPT_SKY = "Why is the sky blue?"
 PROMPT_PRIMES = "Write a Python program to print prime numbers between 1000 and 1100"
 
 
-def warmup(client: Client, model: str) -> None:
-    """Send a short warm-up prompt to load the model into memory."""
+def warmup(client: Client, residency: ResidencyManager, model: str) -> float:
+    """
+    Load the model into memory, then send a short warm-up prompt.
+    Returns the time the server took to load the model, in seconds.
+    """
+    load_seconds = residency.preload(model)
     client.chat(
         model=model,
         messages=[{"role": "user", "content": WARMUP_PROMPT}],
     )
+    return load_seconds
 
 
 def benchmark(client: Client, model: str, prompt: str) -> tuple[float, int]:
@@ -73,6 +84,7 @@ def format_row(model: str, label: str, elapsed: float, tokens: int) -> str:
 
 def main() -> None:
     client = Client()
+    residency = ResidencyManager(keep_alive="10m", client=client)
 
     results: list[tuple[str, str, float, int]] = []
 
@@ -82,8 +94,8 @@ def main() -> None:
         print(f"{'=' * 60}")
 
         print("  Warming up …", end=" ", flush=True)
-        warmup(client, model)
-        print("done.\n")
+        load_seconds = warmup(client, residency, model)
+        print(f"done (model loaded in {load_seconds:.2f}s).\n")
 
         for label, prompt in [("sky-blue", PROMPT_SKY), ("primes", PROMPT_PRIMES)]:
             elapsed, tokens = benchmark(client, model, prompt)
@@ -94,6 +106,8 @@ def main() -> None:
             )
             results.append((model, label, elapsed, tokens))
 
+        residency.unload(model)
+
     # ---- summary table -----------------------------------------------------
     divider = f"\n┌{'─' * 22}┬{'─' * 14}┬{'─' * 10}┬{'─' * 8}┬{'─' * 14}┐"
     header = (
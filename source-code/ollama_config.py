@@ -5,31 +5,1245 @@ Environment variables:
   MODEL          - Override the default model name (default: nemotron-3-nano:4b)
   CLOUD          - If set (any non-empty value), use Ollama Cloud service
   OLLAMA_API_KEY - Required when CLOUD is set; your Ollama Cloud API key
+  OLLAMA_HOST    - Local Ollama server (default: http://localhost:11434)
+
+Connection pool and timeout settings shared by all clients:
+  OLLAMA_MAX_CONNECTIONS   - Maximum open connections per client (default: 20)
+  OLLAMA_MAX_KEEPALIVE     - Idle keep-alive connections kept per client (default: 10)
+  OLLAMA_KEEPALIVE_EXPIRY  - Seconds an idle connection is kept open (default: 30)
+  OLLAMA_CONNECT_TIMEOUT   - Seconds to wait for a connection (default: 10)
+  OLLAMA_TIMEOUT           - Seconds to wait for a response (default: no limit)
+  OLLAMA_MAX_CONCURRENCY   - Requests in flight at once through the async limiter (default: 16)
+
+Load balancing over several local Ollama servers (ignored when CLOUD is set):
+  OLLAMA_HOSTS             - Comma-separated servers, each optionally followed by
+                             ";weight=N" and ";models=a|b" (models it should serve),
+                             e.g. "http://gpu1:11434;weight=2,http://gpu2:11434"
+  OLLAMA_BALANCE           - least_outstanding (default) or round_robin (weighted)
+  OLLAMA_HEALTH_INTERVAL   - Seconds between health checks of every server (default: 10)
+
+Call policy of call_ollama(), call_ollama_async() and stream_ollama():
+  OLLAMA_DEADLINE          - Seconds a call may take, including retries (default: 300)
+  OLLAMA_RETRIES           - Retries of transient failures (default: 2)
+  OLLAMA_RETRY_DELAY       - Base delay in seconds of the jittered exponential backoff (default: 0.5)
+  OLLAMA_BREAKER_FAILURES  - Consecutive failures that open an endpoint's circuit (default: 5)
+  OLLAMA_BREAKER_RESET     - Seconds an open circuit waits before a trial call (default: 30)
+
+Model residency (local server only, see ResidencyManager):
+  OLLAMA_RESIDENT_MODELS     - Comma-separated models to preload and keep loaded
+  OLLAMA_RESIDENT_KEEP_ALIVE - keep_alive sent with every call, e.g. "30m" or "-1" (default: 30m)
+  OLLAMA_RESIDENT_MAX        - Models loaded at once; calls for others wait their turn (default: 0, no limit)
+  OLLAMA_RESIDENT_MIN        - Seconds a model stays loaded before it may be swapped out (default: 30)
+  OLLAMA_RESIDENT_INTERVAL   - Seconds between /api/ps checks (default: 60)
 """
 
+import asyncio
+import contextvars
+import inspect
+import itertools
+import math
 import os
-from ollama import Client
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from datetime import UTC, datetime
+from urllib.parse import urlsplit
+
+import httpx
+from ollama import AsyncClient, Client, ResponseError
 
 DEFAULT_MODEL = "qwen3.5:2b"  # "nemotron-3-nano:4b"
 
+CLOUD_HOST = "https://ollama.com"
+
+# Clients are cached by (host, headers); the clients of one host share an httpx transport,
+# so every caller reuses the same warm keep-alive connections
+_clients = {}
+_transports = {}
+_clients_lock = threading.Lock()
+
+# Async clients and limiters are bound to an event loop, so they are cached per loop
+_async_state = weakref.WeakKeyDictionary()  # loop -> {"clients", "transports", "limiter"}
+
+# Load balancer over OLLAMA_HOSTS, created on first use
+_balancer = None
+_balancer_lock = threading.Lock()
+
+# Shared retry / deadline / circuit breaker policy, created on first use
+_policy = None
+_policy_lock = threading.Lock()
+
+# Model residency manager, created on first use when OLLAMA_RESIDENT_* is set
+_residency = None
+_residency_lock = threading.Lock()
+
+# Client methods whose first argument is a model that has to be loaded
+MODEL_METHODS = ("chat", "generate", "embed", "embeddings")
+
 
 def get_model() -> str:
     """Return the model name from MODEL env var, or the default."""
     return os.environ.get("MODEL", DEFAULT_MODEL)
 
 
-def get_client() -> Client:
+def get_endpoint() -> tuple:
+    """
+    Return (host, headers) for the configured Ollama service: Ollama Cloud
+    with the OLLAMA_API_KEY bearer token when CLOUD is set, otherwise the local
+    server (host None lets the ollama library apply OLLAMA_HOST or its default).
+    """
+    if os.environ.get("CLOUD"):
+        api_key = os.environ.get("OLLAMA_API_KEY", "")
+        return CLOUD_HOST, {"Authorization": "Bearer " + api_key}
+    return None, {}
+
+
+def pool_limits() -> httpx.Limits:
+    """Connection pool limits passed to every client's httpx transport."""
+    return httpx.Limits(
+        max_connections=int(os.environ.get("OLLAMA_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.environ.get("OLLAMA_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=float(os.environ.get("OLLAMA_KEEPALIVE_EXPIRY", "30")),
+    )
+
+
+def _timeout(seconds: float | None) -> httpx.Timeout:
+    connect = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "10"))
+    return httpx.Timeout(seconds, connect=connect if seconds is None else min(connect, seconds))
+
+
+def client_timeout() -> httpx.Timeout:
+    """Default timeouts of every client: OLLAMA_TIMEOUT (no limit when unset) and OLLAMA_CONNECT_TIMEOUT."""
+    return _timeout(float(os.environ.get("OLLAMA_TIMEOUT", "0")) or None)
+
+
+# Timeout of the requests sent in the current thread or task, see request_timeout()
+_request_timeout = contextvars.ContextVar("ollama_request_timeout", default=None)
+
+
+@contextmanager
+def request_timeout(seconds: float | None):
+    """
+    Make the Ollama requests sent inside the block (in this thread or task)
+    time out after `seconds`, whichever shared client sends them:
+
+        with request_timeout(30):
+            response = get_client().chat(...)
+    """
+    token = _request_timeout.set(_timeout(seconds))
+    try:
+        yield
+    finally:
+        _request_timeout.reset(token)
+
+
+class _TimeoutTransport(httpx.BaseTransport):
+    """Applies the request_timeout() in effect to each request of a shared transport."""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        timeout = _request_timeout.get()
+        if timeout is not None:
+            request.extensions["timeout"] = timeout.as_dict()
+        return self._transport.handle_request(request)
+
+    def close(self):
+        self._transport.close()
+
+
+class _AsyncTimeoutTransport(httpx.AsyncBaseTransport):
+    """Async _TimeoutTransport."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        timeout = _request_timeout.get()
+        if timeout is not None:
+            request.extensions["timeout"] = timeout.as_dict()
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def _client_key(host, headers) -> tuple:
+    return host, tuple(sorted((headers or {}).items()))
+
+
+def get_client(host: str | None = None, headers: dict | None = None) -> Client:
     """
     Return an Ollama Client configured for local or cloud use.
 
     When the CLOUD environment variable is set, connects to Ollama Cloud
     using the OLLAMA_API_KEY environment variable for authentication.
     Otherwise, connects to the local Ollama service (http://localhost:11434).
+    Pass `host` (and `headers`) to connect to another server instead. For a
+    timeout other than OLLAMA_TIMEOUT, wrap the call in request_timeout().
+
+    Clients are created once per (host, headers) and shared, and all
+    clients of a host use one connection pool, so repeated calls reuse the
+    same connections. The registry is safe to use from threads.
+
+    When OLLAMA_HOSTS lists several servers (and CLOUD is not set), the
+    default client is a BalancedClient that sends each call to one of them.
     """
-    if os.environ.get("CLOUD"):
-        api_key = os.environ.get("OLLAMA_API_KEY", "")
-        return Client(
-            host="https://ollama.com",
-            headers={"Authorization": "Bearer " + api_key},
-        )
-    return Client()  # default: http://localhost:11434
+    if host is None and headers is None:
+        balancer = get_balancer()
+        if balancer is not None:
+            return balancer.get_client()
+        host, headers = get_endpoint()
+    key = _client_key(host, headers)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            transport = _transports.get(host)
+            if transport is None:
+                transport = _transports[host] = _TimeoutTransport(httpx.HTTPTransport(limits=pool_limits()))
+            client = Client(host=host, headers=headers or None, timeout=client_timeout(), transport=transport)
+            _clients[key] = client
+    return client
+
+
+def close_clients():
+    """Close every cached client and its connections (later calls create new ones)."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        _transports.clear()
+    for client in clients:
+        client.close()
+
+
+def _loop_state() -> dict:
+    loop = asyncio.get_running_loop()
+    state = _async_state.get(loop)
+    if state is None:
+        state = {"clients": {}, "transports": {}, "limiter": asyncio.Semaphore(int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "16")))}
+        _async_state[loop] = state
+    return state
+
+
+def get_async_client(host: str | None = None, headers: dict | None = None) -> AsyncClient:
+    """
+    Async counterpart of get_client(): an ollama.AsyncClient for the same
+    endpoint, with the same pool limits and timeouts, shared by all coroutines
+    of the running event loop. Must be called from inside the event loop.
+    With OLLAMA_HOSTS the default client is balanced like get_client()'s.
+    """
+    if host is None and headers is None:
+        balancer = get_balancer()
+        if balancer is not None:
+            return balancer.get_async_client()
+        host, headers = get_endpoint()
+    state = _loop_state()
+    clients, transports = state["clients"], state["transports"]
+    key = _client_key(host, headers)
+    if key not in clients:
+        if host not in transports:
+            transports[host] = _AsyncTimeoutTransport(httpx.AsyncHTTPTransport(limits=pool_limits()))
+        clients[key] = AsyncClient(host=host, headers=headers or None, timeout=client_timeout(),
+                                   transport=transports[host])
+    return clients[key]
+
+
+def get_async_limiter() -> asyncio.Semaphore:
+    """
+    Semaphore shared by the running event loop that bounds requests in flight
+    to OLLAMA_MAX_CONCURRENCY. Hold it around each request:
+
+        async with get_async_limiter():
+            response = await get_async_client().chat(...)
+
+    Any number of tasks can then be started at once; the rest wait their turn
+    instead of all hitting the server together.
+    """
+    return _loop_state()["limiter"]
+
+
+async def close_async_clients():
+    """Close the async clients of the running event loop."""
+    state = _loop_state()
+    clients = list(state["clients"].values())
+    state["clients"].clear()
+    state["transports"].clear()
+    for client in clients:
+        await client.close()
+
+
+# ---- Load balancing over several Ollama servers ---------------------------
+
+
+def host_url(host: str) -> str:
+    """Full base URL of a server given as a URL or as host[:port] (default port 11434)."""
+    if "://" not in host:
+        host = "http://" + host
+        if urlsplit(host).port is None:
+            host += ":11434"
+    return host.rstrip("/")
+
+
+def _model_name(model: str) -> str:
+    """Model name with an explicit tag, as /api/ps reports it ("llama3" -> "llama3:latest")."""
+    return model if ":" in model else model + ":latest"
+
+
+class Endpoint:
+    """One Ollama server with its routing weight, model hints and live counters."""
+
+    def __init__(self, host: str, weight: float = 1.0, models=()):
+        self.host = host_url(host)
+        self.weight = weight
+        self.models = {_model_name(m) for m in models}  # models this server is meant to serve
+        self.loaded_models = set()  # models resident in memory, from the last health check
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.current_weight = 0.0  # smooth weighted round-robin state
+
+    def stats(self) -> dict:
+        return {
+            "host": self.host, "healthy": self.healthy, "weight": self.weight,
+            "outstanding": self.outstanding, "requests": self.requests, "failures": self.failures,
+            "loaded_models": sorted(self.loaded_models),
+        }
+
+
+def parse_hosts(value: str) -> list:
+    """Endpoints from an OLLAMA_HOSTS value such as "http://a:11434;weight=2;models=llama3|qwen3,b:11434"."""
+    endpoints = []
+    for entry in value.split(","):
+        host, *options = [part.strip() for part in entry.split(";")]
+        if not host:
+            continue
+        settings = dict(option.split("=", 1) for option in options if "=" in option)
+        endpoints.append(Endpoint(
+            host,
+            weight=float(settings.get("weight", 1)),
+            models=[m for m in settings.get("models", "").split("|") if m],
+        ))
+    return endpoints
+
+
+class LoadBalancer:
+    """
+    Routes Ollama calls over several servers.
+
+    Each call goes to a healthy server chosen by least outstanding requests
+    (relative to its weight) or by smooth weighted round-robin. Calls for a
+    model only go to the servers hinted for it with ";models=" when there are
+    any; among equally busy servers, least_outstanding prefers one that
+    already has the model loaded, so models are not loaded everywhere. A
+    server that fails with a connection error or timeout is ejected until a
+    health check (GET /api/ps every `health_interval` seconds) succeeds again.
+    If every server is ejected, all are tried rather than failing outright.
+    """
+
+    def __init__(self, endpoints: list, strategy: str = "least_outstanding", health_interval: float = 10.0):
+        if strategy not in ("least_outstanding", "round_robin"):
+            raise ValueError(f"unknown balancing strategy {strategy!r}")
+        self.endpoints = endpoints
+        self.strategy = strategy
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._ticket = itertools.count()  # tie-breaker for least_outstanding
+        self._stopped = threading.Event()
+        if health_interval > 0:
+            threading.Thread(target=self._health_loop, daemon=True).start()
+        self.client = BalancedClient(self)
+        self.async_client = BalancedAsyncClient(self)
+
+    def get_client(self):
+        """Balanced stand-in for ollama.Client."""
+        return self.client
+
+    def get_async_client(self):
+        """Balanced stand-in for ollama.AsyncClient."""
+        return self.async_client
+
+    def choose(self, model: str | None = None, avoid=()) -> Endpoint:
+        """
+        Pick a server for one call and count it as outstanding until release().
+        Hosts in `avoid` (those with an open circuit breaker) are only picked
+        if no other server is healthy.
+        """
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.healthy] or self.endpoints
+            candidates = [e for e in candidates if e.host not in avoid] or candidates
+            name = _model_name(model) if model else None
+            if name:
+                candidates = [e for e in candidates if name in e.models] or candidates
+            if self.strategy == "round_robin":
+                total = sum(e.weight for e in candidates)
+                for e in candidates:
+                    e.current_weight += e.weight
+                endpoint = max(candidates, key=lambda e: e.current_weight)
+                endpoint.current_weight -= total
+            else:
+                offset = next(self._ticket)
+                endpoint = min(
+                    candidates,
+                    key=lambda e: (e.outstanding / e.weight, name not in e.loaded_models,
+                                   (candidates.index(e) - offset) % len(candidates)),
+                )
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            if name:
+                endpoint.loaded_models.add(name)  # it will be once the call starts
+            return endpoint
+
+    def release(self, endpoint: Endpoint, error: BaseException | None = None):
+        """End a call; connection errors and timeouts eject the server until it passes a health check."""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if isinstance(error, (httpx.TransportError, ConnectionError)):
+                endpoint.failures += 1
+                endpoint.healthy = False
+
+    def check_health(self):
+        """Query /api/ps on every server: update its loaded models, eject or re-admit it."""
+        for endpoint in self.endpoints:
+            try:
+                response = httpx.get(endpoint.host + "/api/ps", timeout=5.0)
+                response.raise_for_status()
+                loaded = {m.get("name") or m.get("model") for m in response.json().get("models", [])}
+            except (httpx.HTTPError, ValueError):
+                with self._lock:
+                    endpoint.healthy = False
+                continue
+            with self._lock:
+                endpoint.healthy = True
+                endpoint.loaded_models = {m for m in loaded if m}
+
+    def _health_loop(self):
+        while not self._stopped.is_set():
+            self.check_health()
+            self._stopped.wait(self.health_interval)
+
+    def stop(self):
+        self._stopped.set()
+
+    def stats(self) -> list:
+        with self._lock:
+            return [endpoint.stats() for endpoint in self.endpoints]
+
+
+def _call_model(args, kwargs):
+    """The model argument of an ollama client call, if any (it is the first parameter)."""
+    model = kwargs.get("model", args[0] if args else None)
+    return model if isinstance(model, str) else None
+
+
+def _choose_endpoint(balancer: LoadBalancer, args, kwargs) -> Endpoint:
+    """
+    Pick the server for a balanced call. Inside an attempt of a CallPolicy
+    call, the attempt is admitted by that server's circuit breaker, so each
+    server of OLLAMA_HOSTS has a breaker of its own.
+    """
+    attempt = _current_attempt.get()
+    if attempt is None:
+        return balancer.choose(_call_model(args, kwargs))
+    endpoint = balancer.choose(_call_model(args, kwargs), avoid=attempt.policy.open_endpoints())
+    try:
+        attempt.admit(endpoint.host)
+    except CircuitOpenError:
+        balancer.release(endpoint)
+        raise
+    return endpoint
+
+
+class BalancedClient:
+    """
+    Stand-in for ollama.Client whose methods (chat, generate, embed, ...)
+    each run on the server the balancer picks for that call.
+    """
+
+    def __init__(self, balancer: LoadBalancer):
+        self._balancer = balancer
+
+    def __getattr__(self, name):
+        if not inspect.isfunction(getattr(Client, name, None)):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            endpoint = _choose_endpoint(self._balancer, args, kwargs)
+            try:
+                result = getattr(get_client(endpoint.host, {}), name)(*args, **kwargs)
+            except BaseException as e:
+                self._balancer.release(endpoint, e)
+                raise
+            if inspect.isgenerator(result):  # stream=True: the call lasts until the stream ends
+                return self._stream(endpoint, result)
+            self._balancer.release(endpoint)
+            return result
+
+        return call
+
+    def _stream(self, endpoint, iterator):
+        error = None
+        try:
+            yield from iterator
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._balancer.release(endpoint, error)
+
+
+class BalancedAsyncClient:
+    """Async stand-in for ollama.AsyncClient, routed like BalancedClient."""
+
+    def __init__(self, balancer: LoadBalancer):
+        self._balancer = balancer
+
+    def __getattr__(self, name):
+        if not inspect.isfunction(getattr(AsyncClient, name, None)):
+            raise AttributeError(name)
+
+        async def call(*args, **kwargs):
+            endpoint = _choose_endpoint(self._balancer, args, kwargs)
+            try:
+                result = await getattr(get_async_client(endpoint.host, {}), name)(*args, **kwargs)
+            except BaseException as e:
+                self._balancer.release(endpoint, e)
+                raise
+            if inspect.isasyncgen(result):  # stream=True: the call lasts until the stream ends
+                return self._stream(endpoint, result)
+            self._balancer.release(endpoint)
+            return result
+
+        return call
+
+    async def _stream(self, endpoint, iterator):
+        error = None
+        try:
+            async for item in iterator:
+                yield item
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._balancer.release(endpoint, error)
+
+
+def get_balancer():
+    """The LoadBalancer over OLLAMA_HOSTS, or None when it is unset or CLOUD is set."""
+    global _balancer
+    if os.environ.get("CLOUD") or not os.environ.get("OLLAMA_HOSTS"):
+        return None
+    with _balancer_lock:
+        if _balancer is None:
+            _balancer = LoadBalancer(
+                parse_hosts(os.environ["OLLAMA_HOSTS"]),
+                strategy=os.environ.get("OLLAMA_BALANCE", "least_outstanding"),
+                health_interval=float(os.environ.get("OLLAMA_HEALTH_INTERVAL", "10")),
+            )
+    return _balancer
+
+
+# ---- Call policy: deadlines, retries and circuit breakers -----------------
+
+# HTTP statuses worth retrying: overload, gateway and transient server errors
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed call may succeed if retried: timeouts, connection errors, 408/429/5xx."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    return (getattr(error, "status_code", None) or getattr(error, "status", None)) in TRANSIENT_STATUSES
+
+
+class CircuitBreaker:
+    """
+    Stops calls to an endpoint after `failure_threshold` consecutive transient
+    failures ("open"). After `reset_timeout` seconds one trial call is let
+    through ("half-open"); its success closes the circuit, its failure opens
+    it again. Not thread-safe on its own; CallPolicy serializes access.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.trial_running:
+            self.trial_running = True
+            return True
+        return False
+
+    def record(self, success: bool) -> bool:
+        """Record a call's outcome; returns True if this opened the circuit."""
+        self.trial_running = False
+        if success:
+            self.failures = 0
+            self.opened_at = None
+            return False
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+
+class CallPolicy:
+    """
+    Deadline, retry and circuit breaker policy shared by all Ollama calls.
+
+    A call gets `deadline` seconds in total. Each attempt is told how much
+    of it is left, to use as its request timeout, so a stalled server cannot
+    hold a worker longer than that. Transient failures are retried up to
+    `retries` times after a jittered exponential delay ("full jitter":
+    uniform in [0, base_delay * 2**attempt], capped at max_delay), as long
+    as the deadline allows. Each endpoint has a CircuitBreaker. While it is
+    open, calls fail at once with CircuitOpenError instead of adding load to
+    a server that is already failing. Per-endpoint counters are available
+    from metrics().
+    """
+
+    def __init__(self, deadline: float = 300.0, retries: int = 2, base_delay: float = 0.5,
+                 max_delay: float = 8.0, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.deadline = deadline
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _count(self, endpoint: str, name: str):
+        counters = self._metrics.setdefault(endpoint, dict.fromkeys(
+            ("calls", "attempts", "successes", "failures", "retries", "timeouts", "rejected", "circuit_opened"), 0))
+        counters[name] += 1
+
+    def _admit(self, endpoint: str, first: bool):
+        with self._lock:
+            if first:
+                self._count(endpoint, "calls")
+            breaker = self._breakers.setdefault(endpoint, CircuitBreaker(self.failure_threshold, self.reset_timeout))
+            if not breaker.allow():
+                self._count(endpoint, "rejected")
+                raise CircuitOpenError(f"circuit breaker for {endpoint} is open after repeated failures")
+            self._count(endpoint, "attempts")
+
+    def _record(self, endpoint: str, error: BaseException | None = None) -> bool:
+        """Record an attempt's outcome; returns whether the error may be retried."""
+        transient = error is not None and is_transient(error)
+        with self._lock:
+            breaker = self._breakers[endpoint]
+            if error is None:
+                self._count(endpoint, "successes")
+            else:
+                self._count(endpoint, "failures")
+                if isinstance(error, (TimeoutError, httpx.TimeoutException)):
+                    self._count(endpoint, "timeouts")
+            # Only failures that point at the endpoint count against its circuit
+            if breaker.record(not transient):
+                self._count(endpoint, "circuit_opened")
+        return transient
+
+    def open_endpoints(self) -> set:
+        """Endpoints whose circuit breaker currently rejects calls."""
+        with self._lock:
+            return {endpoint for endpoint, breaker in self._breakers.items() if breaker.state == "open"}
+
+    def _start(self, endpoint: str | None, first: bool) -> "_Attempt":
+        attempt = _Attempt(self, first)
+        if endpoint is not None:
+            attempt.admit(endpoint)
+        return attempt
+
+    def _retry_delay(self, attempt: "_Attempt", error: Exception, index: int, retries: int, end: float):
+        """Record a failed attempt; returns the jittered delay before the next one, or None to give up."""
+        if attempt.endpoint is not None:
+            transient = self._record(attempt.endpoint, error)
+        else:  # failed before a server was picked, e.g. all circuits open
+            transient = isinstance(error, CircuitOpenError) or is_transient(error)
+        if not transient or index >= retries:
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** index))
+        if time.monotonic() + delay >= end:
+            return None
+        if attempt.endpoint is not None:
+            with self._lock:
+                self._count(attempt.endpoint, "retries")
+        return delay
+
+    def _call(self, fn, endpoint, deadline, retries):
+        retries = self.retries if retries is None else retries
+        end = time.monotonic() + (self.deadline if deadline is None else deadline)
+        for index in range(retries + 1):
+            attempt = self._start(endpoint, index == 0)
+            token = _current_attempt.set(attempt)
+            try:
+                result = fn(max(1, math.ceil(end - time.monotonic())))
+            except Exception as e:
+                delay = self._retry_delay(attempt, e, index, retries, end)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            finally:
+                _current_attempt.reset(token)
+            if attempt.endpoint is not None:
+                self._record(attempt.endpoint)
+            return result, attempt.endpoint
+
+    def call(self, fn, endpoint: str | None = "default", deadline: float | None = None,
+             retries: int | None = None):
+        """
+        Return fn(timeout) under the policy; `timeout` is the number of seconds
+        (rounded up, at least 1) left of the deadline for this attempt.
+
+        With endpoint=None the circuit breaker is chosen per attempt: the
+        attempt is admitted by the breaker of the server it calls once that
+        is known (BalancedClient does this for the server it picks).
+        """
+        return self._call(fn, endpoint, deadline, retries)[0]
+
+    async def call_async(self, fn, endpoint: str | None = "default", deadline: float | None = None,
+                         retries: int | None = None):
+        """Async call(): awaits fn(timeout) and sleeps between attempts without blocking the loop."""
+        retries = self.retries if retries is None else retries
+        end = time.monotonic() + (self.deadline if deadline is None else deadline)
+        for index in range(retries + 1):
+            attempt = self._start(endpoint, index == 0)
+            token = _current_attempt.set(attempt)
+            try:
+                result = await fn(max(1, math.ceil(end - time.monotonic())))
+            except Exception as e:
+                delay = self._retry_delay(attempt, e, index, retries, end)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                _current_attempt.reset(token)
+            if attempt.endpoint is not None:
+                self._record(attempt.endpoint)
+            return result
+
+    def stream(self, open_stream, endpoint: str | None = "default", deadline: float | None = None,
+               retries: int | None = None):
+        """
+        Yield the items of the iterator returned by open_stream(timeout).
+        Opening the stream and waiting for its first item are retried like
+        call(); once items have been yielded, a failure is raised (and
+        counted against the endpoint) instead of repeating output.
+        """
+        def first_item(timeout):
+            iterator = iter(open_stream(timeout))
+            return iterator, next(iterator, _END)
+
+        (iterator, item), endpoint = self._call(first_item, endpoint, deadline, retries)
+        if item is _END:
+            return
+        yield item
+        try:
+            yield from iterator
+        except Exception as e:
+            if endpoint is not None:
+                self._record(endpoint, e)
+            raise
+
+    def metrics(self) -> dict:
+        """Counters and circuit state per endpoint."""
+        with self._lock:
+            return {
+                endpoint: dict(counters, circuit=self._breakers[endpoint].state if endpoint in self._breakers else "closed")
+                for endpoint, counters in self._metrics.items()
+            }
+
+
+_END = object()
+
+# The CallPolicy attempt running in this thread or task, see _choose_endpoint()
+_current_attempt = contextvars.ContextVar("ollama_policy_attempt", default=None)
+
+
+class _Attempt:
+    """One attempt of a CallPolicy call and the endpoint whose breaker admitted it."""
+
+    def __init__(self, policy: CallPolicy, first: bool):
+        self.policy = policy
+        self.first = first
+        self.endpoint = None
+
+    def admit(self, endpoint: str):
+        """
+        Pass the circuit breaker of `endpoint` (raises CircuitOpenError); the
+        attempt's outcome is recorded for it. Only the first server an attempt
+        calls is admitted.
+        """
+        if self.endpoint is not None:
+            return
+        self.policy._admit(endpoint, self.first)
+        self.endpoint = endpoint
+
+
+def get_policy() -> CallPolicy:
+    """The CallPolicy shared by the whole process, configured from the environment."""
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = CallPolicy(
+                deadline=float(os.environ.get("OLLAMA_DEADLINE", "300")),
+                retries=int(os.environ.get("OLLAMA_RETRIES", "2")),
+                base_delay=float(os.environ.get("OLLAMA_RETRY_DELAY", "0.5")),
+                failure_threshold=int(os.environ.get("OLLAMA_BREAKER_FAILURES", "5")),
+                reset_timeout=float(os.environ.get("OLLAMA_BREAKER_RESET", "30")),
+            )
+    return _policy
+
+
+def endpoint_name() -> str | None:
+    """
+    Name of the configured endpoint, used as the policy's circuit breaker key;
+    None with OLLAMA_HOSTS, where each attempt uses the breaker of the server
+    the balancer picks for it.
+    """
+    if get_balancer() is not None:
+        return None
+    host, _ = get_endpoint()
+    return host or os.environ.get("OLLAMA_HOST") or "http://localhost:11434"
+
+
+def _call_model_name(method: str, args, kwargs):
+    if method not in MODEL_METHODS:
+        return None
+    return kwargs.get("model") or (args[0] if args else None)
+
+
+def call_ollama(method: str, *args, deadline: float | None = None, **kwargs):
+    """
+    Call get_client().<method>(*args, **kwargs) (chat, generate, embed, ...)
+    under the shared policy: a deadline, retries and a circuit breaker.
+    With a ResidencyManager the call also holds a residency slot for its
+    model and sends the manager's keep_alive.
+    """
+    model = _call_model_name(method, args, kwargs)
+    deadline = deadline or get_policy().deadline
+    end = time.monotonic() + deadline  # waiting for a residency slot counts against the deadline
+    with resident(model, deadline) as keep_alive:
+        if keep_alive is not None:
+            kwargs.setdefault("keep_alive", keep_alive)
+
+        def attempt(timeout):
+            with request_timeout(timeout):
+                return getattr(get_client(), method)(*args, **kwargs)
+
+        return get_policy().call(attempt, endpoint=endpoint_name(), deadline=end - time.monotonic())
+
+
+async def call_ollama_async(method: str, *args, deadline: float | None = None, **kwargs):
+    """
+    Async call_ollama(): each attempt holds a slot of get_async_limiter() and
+    is cancelled when the time left of the deadline runs out.
+
+    The *_async functions of the tools go through here, so any number of
+    them can be gathered on one event loop: at most OLLAMA_MAX_CONCURRENCY
+    requests are in flight at once and the rest wait their turn.
+    """
+    async def attempt(timeout):
+        async with get_async_limiter():
+            with request_timeout(timeout):
+                return await asyncio.wait_for(getattr(get_async_client(), method)(*args, **kwargs), timeout)
+
+    model = _call_model_name(method, args, kwargs)
+    deadline = deadline or get_policy().deadline
+    end = time.monotonic() + deadline
+    async with resident_async(model, deadline) as keep_alive:
+        if keep_alive is not None:
+            kwargs.setdefault("keep_alive", keep_alive)
+        return await get_policy().call_async(attempt, endpoint=endpoint_name(), deadline=end - time.monotonic())
+
+
+def stream_ollama(method: str, *args, deadline: float | None = None, **kwargs):
+    """
+    Streaming call_ollama(): yields the chunks of get_client().<method>(...,
+    stream=True). The request is retried until the first chunk arrives; the
+    deadline also bounds how long the server may stall between chunks.
+    """
+    model = _call_model_name(method, args, kwargs)
+    deadline = deadline or get_policy().deadline
+    end = time.monotonic() + deadline
+    with resident(model, deadline) as keep_alive:
+        if keep_alive is not None:
+            kwargs.setdefault("keep_alive", keep_alive)
+
+        def open_stream(timeout):
+            # The request is only sent by the first next(); its timeout then covers every chunk read
+            stream = getattr(get_client(), method)(*args, stream=True, **kwargs)
+            with request_timeout(timeout):
+                first = next(stream, _END)
+            return iter(()) if first is _END else itertools.chain([first], stream)
+
+        yield from get_policy().stream(open_stream, endpoint=endpoint_name(), deadline=end - time.monotonic())
+
+
+def policy_metrics() -> dict:
+    """Per-endpoint call counters and circuit breaker state of the shared policy."""
+    return get_policy().metrics()
+
+
+# ---- Model residency: preloading, keep_alive and load scheduling ----------
+
+
+class ResidencyManager:
+    """
+    Keeps the models an application uses loaded in one Ollama server.
+
+    `models` are preloaded when the manager starts and kept loaded: every
+    `interval` seconds /api/ps is checked, pinned models that were evicted
+    are loaded again and those about to expire get their keep_alive
+    refreshed. Calls made through acquire()/release() (see resident())
+    pass `keep_alive` along, so models in active use stay loaded too.
+
+    With `max_loaded` > 0, at most that many models are loaded at once. A
+    call for a model that is not loaded waits for a slot instead of making
+    the server evict a model another call is still using. Once a loaded model
+    has been resident for `min_resident` seconds it can be swapped out. It
+    takes no new calls until its calls in flight finish, and is then
+    unloaded. Unpinned models go first, then the least recently used. Each
+    slot therefore changes model at most once per `min_resident` seconds,
+    and calls are batched per model instead of alternating loads.
+    """
+
+    def __init__(self, models=(), keep_alive="30m", max_loaded: int = 0, min_resident: float = 30.0,
+                 interval: float = 60.0, client=None):
+        self.models = [_model_name(m) for m in models]
+        self.keep_alive = keep_alive
+        self.max_loaded = max_loaded
+        self.min_resident = min_resident
+        self.interval = interval
+        self._client = client
+        self._resident = {}  # model -> {"loaded_at", "last_used", "inflight", "expires_at", "size"}
+        self._draining = set()  # models being swapped out: no new calls, unloaded when idle
+        self._embedding_models = set()  # models that only load through /api/embed
+        self._counters = dict.fromkeys(("loads", "refreshes", "evictions", "server_evictions", "waits"), 0)
+        self._cond = threading.Condition()
+        self._async_waiters = set()  # (loop, asyncio.Event) of acquire_async() calls waiting for a slot
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def client(self):
+        return self._client or get_client()
+
+    def start(self):
+        """Preload the pinned models and check residency every `interval` seconds in the background."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            try:
+                self.check()
+            except (httpx.HTTPError, ConnectionError, ResponseError) as e:
+                print(f"Model residency check failed: {e}")
+            self._stopped.wait(self.interval)
+
+    # ---- loading and unloading ---------------------------------------
+
+    def _request(self, model: str, keep_alive):
+        """Empty request that loads `model` (or unloads it, with keep_alive 0) and resets its expiry."""
+        client = self.client()
+        if model not in self._embedding_models:
+            try:
+                return client.generate(model=model, prompt="", keep_alive=keep_alive)
+            except ResponseError as e:
+                if "does not support generate" not in str(e):
+                    raise
+                self._embedding_models.add(model)
+        return client.embed(model=model, input=[], keep_alive=keep_alive)
+
+    def preload(self, model: str) -> float:
+        """Load `model` now (waiting for a slot if needed); returns the server's load time in seconds."""
+        name = _model_name(model)
+        self.acquire(name)
+        try:
+            response = self._request(name, self.keep_alive)
+        finally:
+            self.release(name)
+        with self._cond:
+            self._counters["loads"] += 1
+        return (response.get("load_duration") or 0) / 1e9
+
+    def _unload_evicted(self, model: str):
+        """
+        Unload a model swapped out by acquire() or release(). A failure is only
+        reported: the scheduling already moved on, and the next check() finds
+        the model again if it is still loaded.
+        """
+        try:
+            self._request(model, 0)
+        except (httpx.HTTPError, ConnectionError, ResponseError) as e:
+            print(f"Unloading model {model} failed: {e}")
+
+    def unload(self, model: str):
+        """Unload `model` from the server now."""
+        name = _model_name(model)
+        with self._cond:
+            self._drop(name)
+            self._notify()
+        self._request(name, 0)
+
+    # ---- scheduling ---------------------------------------------------
+
+    def _add(self, model: str, now: float) -> dict:
+        entry = {"loaded_at": now, "last_used": now, "inflight": 0, "expires_at": None, "size": None}
+        self._resident[model] = entry
+        return entry
+
+    def _notify(self):
+        """Wake the acquire() and acquire_async() calls waiting for a slot (call under self._cond)."""
+        self._cond.notify_all()
+        for loop, event in self._async_waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def _drop(self, model: str):
+        self._resident.pop(model, None)
+        self._draining.discard(model)
+
+    def _swap_out(self, now: float):
+        """Mark a model to make room for another; returns it if it can be unloaded right away."""
+        candidates = [m for m, entry in self._resident.items() if now - entry["loaded_at"] >= self.min_resident]
+        if not candidates:
+            return None
+        victim = min(candidates, key=lambda m: (m in self.models, self._resident[m]["last_used"]))
+        if self._resident[victim]["inflight"]:
+            self._draining.add(victim)
+            return None
+        self._drop(victim)
+        self._counters["evictions"] += 1
+        return victim
+
+    def _wait_time(self, now: float, end: float):
+        """How long to wait for a slot: until a model may be swapped out, or until the deadline."""
+        waits = [entry["loaded_at"] + self.min_resident - now for entry in self._resident.values()]
+        waits = [w for w in waits if w > 0]
+        if end is not None:
+            waits.append(end - now)
+        return min(waits) if waits else None
+
+    def acquire(self, model: str, timeout: float | None = None, blocking: bool = True) -> bool:
+        """
+        Count a call for `model` as in flight, waiting (up to `timeout`
+        seconds) until it may be loaded. Returns False if it could not be
+        admitted in time, or at once when not `blocking`.
+        """
+        name = _model_name(model)
+        end = None if timeout is None else time.monotonic() + timeout
+        evicted = None
+        waited = False
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                entry = self._resident.get(name)
+                if entry is not None and name not in self._draining:
+                    break
+                if entry is None:
+                    if self.max_loaded <= 0 or len(self._resident) < self.max_loaded:
+                        entry = self._add(name, now)
+                        break
+                    if not self._draining:
+                        evicted = self._swap_out(now)
+                        if evicted is not None:
+                            entry = self._add(name, now)
+                            break
+                if not blocking or (end is not None and now >= end):
+                    return False
+                if not waited:
+                    waited = True
+                    self._counters["waits"] += 1
+                self._cond.wait(self._wait_time(now, end))
+            entry["inflight"] += 1
+            entry["last_used"] = now
+        if evicted is not None:
+            self._unload_evicted(evicted)
+        return True
+
+    async def acquire_async(self, model: str, timeout: float | None = None) -> bool:
+        """Async acquire(): waits for a slot without blocking the event loop."""
+        end = None if timeout is None else time.monotonic() + timeout
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            self._async_waiters.add(waiter)
+        try:
+            waited = False
+            while True:
+                waiter[1].clear()  # before trying, so a release in between is not missed
+                if self.acquire(model, blocking=False):
+                    return True
+                now = time.monotonic()
+                if end is not None and now >= end:
+                    return False
+                with self._cond:
+                    if not waited:
+                        waited = True
+                        self._counters["waits"] += 1
+                    wait = self._wait_time(now, end)
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), wait)
+                except TimeoutError:
+                    pass
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+
+    def release(self, model: str):
+        """End a call started with acquire(); a model being swapped out is unloaded after its last call."""
+        name = _model_name(model)
+        evicted = None
+        with self._cond:
+            entry = self._resident.get(name)
+            if entry is None:
+                return
+            entry["inflight"] -= 1
+            entry["last_used"] = time.monotonic()
+            if name in self._draining and not entry["inflight"]:
+                self._drop(name)
+                self._counters["evictions"] += 1
+                evicted = name
+            self._notify()
+        if evicted is not None:
+            self._unload_evicted(evicted)
+
+    # ---- /api/ps ------------------------------------------------------
+
+    def check(self):
+        """
+        Sync with /api/ps: forget models the server evicted, count models
+        loaded by others against max_loaded, reload evicted pinned models if
+        there is room and refresh the keep_alive of those about to expire.
+        """
+        loaded = {_model_name(m.model or m.name): m for m in self.client().ps().models}
+        now = time.monotonic()
+        wall = datetime.now(UTC)
+        to_load, to_refresh = [], []
+        with self._cond:
+            for model, entry in list(self._resident.items()):
+                # A model with calls in flight may still be loading
+                if model not in loaded and not entry["inflight"]:
+                    self._drop(model)
+                    self._counters["server_evictions"] += 1
+            for model, info in loaded.items():
+                entry = self._resident.get(model) or self._add(model, now)
+                entry["expires_at"] = info.expires_at
+                entry["size"] = info.size
+                expires = info.expires_at
+                if model in self.models and expires is not None and (expires - wall).total_seconds() < 2 * self.interval:
+                    to_refresh.append(model)
+            for model in self.models:
+                if model not in self._resident and (self.max_loaded <= 0 or len(self._resident) < self.max_loaded):
+                    self._add(model, now)
+                    to_load.append(model)
+            self._notify()
+        for model in to_load + to_refresh:
+            self._request(model, self.keep_alive)
+            with self._cond:
+                self._counters["loads" if model in to_load else "refreshes"] += 1
+
+    def stats(self) -> dict:
+        """Loaded models with their calls in flight and size, and load/eviction counters."""
+        with self._cond:
+            return {
+                **self._counters,
+                "resident": {
+                    model: {"inflight": entry["inflight"], "size": entry["size"], "pinned": model in self.models,
+                            "draining": model in self._draining}
+                    for model, entry in self._resident.items()
+                },
+            }
+
+
+def get_residency():
+    """
+    The ResidencyManager configured by OLLAMA_RESIDENT_*, started on first
+    use, or None when neither models nor a limit are configured, or when
+    CLOUD or OLLAMA_HOSTS is set (the cloud and the balancer manage
+    placement themselves).
+    """
+    global _residency
+    models = [m.strip() for m in os.environ.get("OLLAMA_RESIDENT_MODELS", "").split(",") if m.strip()]
+    max_loaded = int(os.environ.get("OLLAMA_RESIDENT_MAX", "0"))
+    if os.environ.get("CLOUD") or os.environ.get("OLLAMA_HOSTS") or not (models or max_loaded):
+        return None
+    keep_alive = os.environ.get("OLLAMA_RESIDENT_KEEP_ALIVE", "30m")
+    if keep_alive.lstrip("-").replace(".", "", 1).isdigit():
+        keep_alive = float(keep_alive)  # plain numbers are seconds; -1 keeps models loaded indefinitely
+    with _residency_lock:
+        if _residency is None:
+            _residency = ResidencyManager(
+                models,
+                keep_alive=keep_alive,
+                max_loaded=max_loaded,
+                min_resident=float(os.environ.get("OLLAMA_RESIDENT_MIN", "30")),
+                interval=float(os.environ.get("OLLAMA_RESIDENT_INTERVAL", "60")),
+            ).start()
+    return _residency
+
+
+@contextmanager
+def resident(model: str, timeout: float | None = None):
+    """
+    Hold a residency slot for `model` around one call and yield the
+    keep_alive to send with it (None without a ResidencyManager):
+
+        with resident(model) as keep_alive:
+            client.chat(model=model, ..., keep_alive=keep_alive)
+    """
+    manager = get_residency()
+    if manager is None or not model:
+        yield None
+        return
+    if not manager.acquire(model, timeout):
+        raise TimeoutError(f"no residency slot for {model} within {timeout} seconds")
+    try:
+        yield manager.keep_alive
+    finally:
+        manager.release(model)
+
+
+@asynccontextmanager
+async def resident_async(model: str, timeout: float | None = None):
+    """Async resident(): waits for a slot without blocking the event loop."""
+    manager = get_residency()
+    if manager is None or not model:
+        yield None
+        return
+    if not await manager.acquire_async(model, timeout):
+        raise TimeoutError(f"no residency slot for {model} within {timeout} seconds")
+    try:
+        yield manager.keep_alive
+    finally:
+        manager.release(model)
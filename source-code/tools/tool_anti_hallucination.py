@@ -12,7 +12,7 @@ if str(ROOT) not in sys.path:
 from pprint import pprint
 import json
 
-from ollama_config import get_client, get_model
+from ollama_config import call_ollama, call_ollama_async, get_model
 
 def read_anti_hallucination_template() -> str:
     """
@@ -42,24 +42,42 @@ def detect_hallucination(user_input: str, context: str, output: str) -> str:
        ]
      }
     """
-    prompt = TEMPLATE.format(input=user_input, context=context, output=output)
-    client = get_client()
-    response = client.chat(
+    response = call_ollama(
+        "chat",
+        model=get_model(),
+        messages=_hallucination_messages(user_input, context, output),
+    )
+    return _parse_hallucination(response.message.content)
+
+
+async def detect_hallucination_async(user_input: str, context: str, output: str) -> str:
+    """Async version of detect_hallucination."""
+    response = await call_ollama_async(
+        "chat",
         model=get_model(),
-        messages=[
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": output},
-        ],
+        messages=_hallucination_messages(user_input, context, output),
     )
+    return _parse_hallucination(response.message.content)
+
+
+def _hallucination_messages(user_input: str, context: str, output: str) -> list:
+    prompt = TEMPLATE.format(input=user_input, context=context, output=output)
+    return [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": output},
+    ]
+
+
+def _parse_hallucination(content: str):
     try:
-        return json.loads(response.message.content)
+        return json.loads(content)
     except json.JSONDecodeError:
-        print(f"Error decoding JSON: {response.message.content}")
+        print(f"Error decoding JSON: {content}")
     return {"score": 0.0, "reason": ["Error decoding JSON"]}
 
 
 # Export the functions
-__all__ = ["detect_hallucination"]
+__all__ = ["detect_hallucination", "detect_hallucination_async"]
 
 ## Test only code:
 
@@ -9,15 +9,12 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from typing import Dict
-from pathlib import Path
 import re
 
-from ollama_config import get_client, get_model
+from ollama_config import call_ollama, call_ollama_async, get_model
 
-client = get_client()
 
-def judge_results(original_prompt: str, llm_gen_results: str) -> Dict[str, str]:
+def judge_results(original_prompt: str, llm_gen_results: str) -> dict[str, str]:
     """
     Takes an original prompt to a LLM and the output results
 
@@ -31,26 +28,47 @@ def judge_results(original_prompt: str, llm_gen_results: str) -> Dict[str, str]:
             - 'G': A Good result
     """
     try:
-        messages = [
-            {"role": "system", "content": "Always judge this output for correctness."},
-            {"role": "user", "content": f"Evaluate this output:\n\n{llm_gen_results}\n\nfor this prompt:\n\n{original_prompt}\n\nDouble check your work and explain your thinking in a few sentences. End your output with a Y or N answer"},
-        ]
-
-        response = client.chat(
+        response = call_ollama(
+            "chat",
             model=get_model(),
-            messages=messages,
+            messages=_judge_messages(original_prompt, llm_gen_results),
         )
+        return _parse_judgement(response.message.content)
 
-        r = response.message.content.strip()
-        print(f"\n\noriginal COT response:\n\n{r}\n\n")
+    except Exception as e:  # noqa: BLE001 - any failure is judged 'E'
+        print(f"\n\n***** {e=}\n\n")
+        return {'judgement': 'E', 'reasoning': str(e)}  # on any error, assign 'E' result
 
-        # look at the end of the response for the Y or N judgement
-        s = r.lower()
-        # remove all non-alphabetic characters:
-        s = re.sub(r'[^a-zA-Z]', '', s).strip()
 
-        return {'judgement': s[-1].upper(), 'reasoning': r[1:].strip()}
+async def judge_results_async(original_prompt: str, llm_gen_results: str) -> dict[str, str]:
+    """Async version of judge_results."""
+    try:
+        response = await call_ollama_async(
+            "chat",
+            model=get_model(),
+            messages=_judge_messages(original_prompt, llm_gen_results),
+        )
+        return _parse_judgement(response.message.content)
 
-    except Exception as e:
+    except Exception as e:  # noqa: BLE001 - any failure is judged 'E'
         print(f"\n\n***** {e=}\n\n")
         return {'judgement': 'E', 'reasoning': str(e)}  # on any error, assign 'E' result
+
+
+def _judge_messages(original_prompt: str, llm_gen_results: str) -> list:
+    return [
+        {"role": "system", "content": "Always judge this output for correctness."},
+        {"role": "user", "content": f"Evaluate this output:\n\n{llm_gen_results}\n\nfor this prompt:\n\n{original_prompt}\n\nDouble check your work and explain your thinking in a few sentences. End your output with a Y or N answer"},
+    ]
+
+
+def _parse_judgement(content: str) -> dict[str, str]:
+    r = content.strip()
+    print(f"\n\noriginal COT response:\n\n{r}\n\n")
+
+    # look at the end of the response for the Y or N judgement
+    s = r.lower()
+    # remove all non-alphabetic characters:
+    s = re.sub(r'[^a-zA-Z]', '', s).strip()
+
+    return {'judgement': s[-1].upper(), 'reasoning': r[1:].strip()}
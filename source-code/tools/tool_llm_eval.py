@@ -1,13 +1,12 @@
 import json
 import sys
 from pathlib import Path
-from typing import List, Dict, Optional
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from ollama_config import get_client, get_model
+from ollama_config import call_ollama, call_ollama_async, get_model
 
 
 def clean_json_response(response: str) -> str:
@@ -27,11 +26,14 @@ def clean_json_response(response: str) -> str:
         response = response[start:]
     return response
 
+EVALUATOR_SYSTEM_PROMPT = "You are an expert AI evaluator. Provide detailed, objective assessments in JSON format. Only return JSON, no other text."
+
+
 def evaluate_llm_conversation(
-    chat_history: List[Dict[str, str]],
-    evaluation_criteria: Optional[List[str]] = None,
-    model: str = None  # defaults to get_model() when None
-) -> Dict[str, any]:
+    chat_history: list[dict[str, str]],
+    evaluation_criteria: list[str] | None = None,
+    model: str | None = None  # defaults to get_model() when None
+) -> dict[str, any]:
     """
     Evaluates a chat history using Ollama to run the evaluation model.
 
@@ -46,6 +48,48 @@ def evaluate_llm_conversation(
     if model is None:
         model = get_model()
 
+    try:
+        response = call_ollama(
+            "generate",
+            model=model,
+            prompt=_evaluation_prompt(chat_history, evaluation_criteria),
+            system=EVALUATOR_SYSTEM_PROMPT,
+        )
+        return _parse_evaluation(response['response'])
+
+    except Exception as e:  # noqa: BLE001 - failures are reported in the result
+        return {
+            "error": f"Evaluation failed: {e}",
+            "status": "failed"
+        }
+
+
+async def evaluate_llm_conversation_async(
+    chat_history: list[dict[str, str]],
+    evaluation_criteria: list[str] | None = None,
+    model: str | None = None  # defaults to get_model() when None
+) -> dict[str, any]:
+    """Async version of evaluate_llm_conversation."""
+    if model is None:
+        model = get_model()
+
+    try:
+        response = await call_ollama_async(
+            "generate",
+            model=model,
+            prompt=_evaluation_prompt(chat_history, evaluation_criteria),
+            system=EVALUATOR_SYSTEM_PROMPT,
+        )
+        return _parse_evaluation(response['response'])
+
+    except Exception as e:  # noqa: BLE001 - failures are reported in the result
+        return {
+            "error": f"Evaluation failed: {e}",
+            "status": "failed"
+        }
+
+
+def _evaluation_prompt(chat_history: list[dict[str, str]], evaluation_criteria: list[str] | None) -> str:
     if evaluation_criteria is None:
         evaluation_criteria = [
             "Response accuracy",
@@ -62,7 +106,7 @@ def evaluate_llm_conversation(
     ])
 
     # Create evaluation prompt
-    evaluation_prompt = f"""
+    return f"""
     Please evaluate the following conversation between a user and an AI assistant.
     Focus on these criteria: {', '.join(evaluation_criteria)}
 
@@ -78,32 +122,18 @@ def evaluate_llm_conversation(
     Format your response as JSON.
     """
 
-    try:
-        client = get_client()
-        response = client.generate(
-            model=model,
-            prompt=evaluation_prompt,
-            system="You are an expert AI evaluator. Provide detailed, objective assessments in JSON format. Only return JSON, no other text."
-        )
-
-        response_clean: str = clean_json_response(response['response'])
 
-        # Parse the response to extract JSON
-        try:
-            evaluation_result = json.loads(response_clean)
-        except json.JSONDecodeError:
-            # Fallback if response isn't proper JSON
-            evaluation_result = {
-                "error": "Could not parse evaluation as JSON",
-                "raw_response": response_clean
-            }
+def _parse_evaluation(response_text: str) -> dict[str, any]:
+    response_clean: str = clean_json_response(response_text)
 
-        return evaluation_result
-
-    except Exception as e:
+    # Parse the response to extract JSON
+    try:
+        return json.loads(response_clean)
+    except json.JSONDecodeError:
+        # Fallback if response isn't proper JSON
         return {
-            "error": f"Evaluation failed: {str(e)}",
-            "status": "failed"
+            "error": "Could not parse evaluation as JSON",
+            "raw_response": response_clean
         }
 
 # Example usage
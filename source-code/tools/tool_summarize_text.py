@@ -9,7 +9,7 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from ollama_config import get_client, get_model
+from ollama_config import call_ollama, call_ollama_async, get_model
 
 
 def summarize_text(text: str, context: str = "") -> str:
@@ -24,21 +24,34 @@ def summarize_text(text: str, context: str = "") -> str:
         a string of summarized text
 
     """
+    summary = call_ollama(
+        "chat",
+        model=get_model(),
+        messages=_summary_messages(text, context),
+    )
+    return summary["message"]["content"]
+
+
+async def summarize_text_async(text: str, context: str = "") -> str:
+    """Async version of summarize_text."""
+    summary = await call_ollama_async(
+        "chat",
+        model=get_model(),
+        messages=_summary_messages(text, context),
+    )
+    return summary["message"]["content"]
+
+
+def _summary_messages(text: str, context: str) -> list:
     prompt = "Summarize this text (and be concise), returning only the summary with NO OTHER COMMENTS:\n\n"
     if len(text.strip()) < 50:
         text = context
     elif len(context) > 50:
         prompt = f"Given this context:\n\n{context}\n\n" + prompt
-
-    client = get_client()
-    summary = client.chat(
-        model=get_model(),
-        messages=[
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": text},
-        ],
-    )
-    return summary["message"]["content"]
+    return [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": text},
+    ]
 
 
 # Function metadata for Ollama integration
@@ -50,4 +63,4 @@ summarize_text.metadata = {
 }
 
 # Export the functions
-__all__ = ["summarize_text"]
+__all__ = ["summarize_text", "summarize_text_async"]